@@ -0,0 +1,95 @@
+# Stateful environment alert engine
+# Alerts are raised only after a reading has stayed past the enter threshold for a minimum
+# duration, and cleared only once it is back inside the exit threshold. State changes are
+# published on a sequence-numbered change feed so consumers only process actual transitions.
+
+import itertools
+import threading
+from collections import deque
+from datetime import datetime
+
+# Margins are in the metric's own unit: enter beyond the safe range, exit back inside it
+ENTER_MARGIN = {'temp': 0.5, 'humidity': 2}
+EXIT_MARGIN = {'temp': 0.5, 'humidity': 2}
+MIN_DURATION = 20
+FEED_SIZE = 10000
+
+UNITS = {'temp': '°C', 'humidity': '%'}
+
+
+class AlertEngine:
+    def __init__(self, enter_margin=None, exit_margin=None, min_duration=MIN_DURATION, feed_size=FEED_SIZE):
+        self.enter_margin = dict(enter_margin or ENTER_MARGIN)
+        self.exit_margin = dict(exit_margin or EXIT_MARGIN)
+        self.min_duration = min_duration
+        self.active = {}
+        self.pending = {}
+        self.feed = deque(maxlen=feed_size)
+        self.seq = 0
+        self._ids = itertools.count(1)
+        self.lock = threading.Lock()
+
+    # ===================== EVALUATION =====================
+    def evaluate(self, product, location, metric, value, safe_range, ts):
+        lo, hi = safe_range
+        key = (product, location, metric)
+        with self.lock:
+            alert = self.active.get(key)
+            if alert is None:
+                enter = self.enter_margin.get(metric, 0)
+                if value < lo - enter or value > hi + enter:
+                    since = self.pending.setdefault(key, ts)
+                    if ts - since >= self.min_duration:
+                        del self.pending[key]
+                        self._raise(key, value, since)
+                else:
+                    self.pending.pop(key, None)
+            else:
+                alert['value'] = value
+                # A safe range narrower than twice the margin would leave no value that clears it
+                exit_ = min(self.exit_margin.get(metric, 0), (hi - lo) / 2)
+                if lo + exit_ <= value <= hi - exit_:
+                    self._clear(key, ts)
+
+    def _raise(self, key, value, since):
+        product, location, metric = key
+        alert = {
+            'id': next(self._ids),
+            'product': product,
+            'location': location,
+            'metric': metric,
+            'value': value,
+            'raised_at': datetime.fromtimestamp(since).isoformat(),
+            'cleared_at': None,
+        }
+        self.active[key] = alert
+        self._publish('raised', alert)
+
+    def _clear(self, key, ts):
+        alert = self.active.pop(key)
+        alert['cleared_at'] = datetime.fromtimestamp(ts).isoformat()
+        self._publish('cleared', alert)
+
+    def _publish(self, kind, alert):
+        self.seq += 1
+        self.feed.append({'seq': self.seq, 'type': kind, 'alert': dict(alert)})
+
+    # ===================== READ =====================
+    def changes(self, since=0):
+        # A consumer that fell behind the bounded feed gets a reset with the full active set instead,
+        # as does one ahead of it (its seq came from before a restart)
+        with self.lock:
+            oldest = self.feed[0]['seq'] if self.feed else self.seq + 1
+            if since > self.seq or (since + 1 < oldest and since < self.seq):
+                return {'seq': self.seq, 'reset': True, 'active': [dict(a) for a in self.active.values()]}
+            skip = max(0, since + 1 - oldest)
+            return {'seq': self.seq, 'reset': False, 'changes': list(itertools.islice(self.feed, skip, None))}
+
+    def messages(self, products):
+        # Active alerts in the {product: [message]} shape the dashboard renders
+        with self.lock:
+            alerts = {p: [] for p in products}
+            for a in self.active.values():
+                alerts.setdefault(a['product'], []).append(
+                    f"{a['location'].capitalize()} {a['metric']} out of range: {a['value']}{UNITS.get(a['metric'], '')}")
+            return alerts
@@ -2,46 +2,91 @@
 # Smart Shelf Replenishment System with Environmental Monitoring
 
 from flask import Flask, render_template, jsonify, request
+from collections import OrderedDict
 from datetime import datetime
+import itertools
+import math
+import os
 import random
 import threading
 import time
-import requests
+import uuid
+from werkzeug.serving import is_running_from_reloader
+
+from alerts import AlertEngine
+from forecasting import DemandForecaster
+from leadtime import LeadTimeTracker
+from coalescing import RestockCoalescer
+from compression import accepted_encodings, init_compression
+from export import in_range, ndjson_response, time_range
+from records import Product, SensorReading
+from state import ProductTable, StoreState
+from catalog import CatalogIndex
+from catalog_io import (catalog_row, collect, csv_chunks, parse_config, parse_product, read_rows, stream_format,
+                        text_stream)
+from jsonprovider import FragmentCache, init_json
 
 app = Flask(__name__)
+init_json(app)
+init_compression(app)
+
+# ===================== CONFIG =====================
+# Defaults come from the environment; create_app(config) overrides them before the engines are built
+app.config.from_mapping(
+    SUPPLIER_URL=os.environ.get('SUPPLIER_URL', 'http://localhost:5001'),
+    # Seconds before a supplier call is given up on; decisions and the dispatch sync wait on them
+    SUPPLIER_TIMEOUT=float(os.environ.get('SUPPLIER_TIMEOUT', 5)),
+    # Sent as X-Store-Id on every supplier call, so the supplier's rate limit and open-order cap
+    # count this store's calls together
+    STORE_ID=os.environ.get('STORE_ID', 'retail-store-1'),
+    SENSOR_TICK_SECONDS=float(os.environ.get('SENSOR_TICK_SECONDS', 10)),
+    SENSOR_SEED=int(os.environ['SENSOR_SEED']) if os.environ.get('SENSOR_SEED') else None,
+    SENSOR_ARCHIVE_DIR=os.environ.get('SENSOR_ARCHIVE_DIR', 'sensor_archive'),
+    RESTOCK_COALESCE_SECONDS=float(os.environ.get('RESTOCK_COALESCE_SECONDS', 1.0)),
+    # CSV or JSON Lines catalog loaded by create_app() on top of the products below
+    CATALOG_PATH=os.environ.get('CATALOG_PATH'),
+)
 
 # ===================== DATA STORES =====================
-products = {
-    'Milk': {
-        'stock': 10,
-        'threshold': 5,
-        'sales': 0,
-        'safe_temp': (2, 8),
-        'safe_humidity': (60, 90),
-        'sensors': {
-            'shelf': {'temp': 5.0, 'humidity': 75},
-            'inventory': {'temp': 7.0, 'humidity': 65}
-        }
-    },
-    'Bread': {
-        'stock': 20,
-        'threshold': 8,
-        'sales': 0,
-        'safe_temp': (20, 25),
-        'safe_humidity': (30, 60),
-        'sensors': {
-            'shelf': {'temp': 22.0, 'humidity': 45},
-            'inventory': {'temp': 25.0, 'humidity': 55}
-        }
-    }
-}
+# Immutable versioned snapshots: writes publish new Product copies through `state`, and readers
+# take `products.current` once per response (state.py)
+products = ProductTable({
+    'Milk': Product(
+        'Milk',
+        stock=10,
+        threshold=5,
+        safe_temp=(2, 8),
+        safe_humidity=(60, 90),
+        sensors={
+            'shelf': SensorReading(5.0, 75),
+            'inventory': SensorReading(7.0, 65)
+        },
+        category='Dairy'
+    ),
+    'Bread': Product(
+        'Bread',
+        stock=20,
+        threshold=8,
+        safe_temp=(20, 25),
+        safe_humidity=(30, 60),
+        sensors={
+            'shelf': SensorReading(22.0, 45),
+            'inventory': SensorReading(25.0, 55)
+        },
+        category='Bakery'
+    )
+})
 
 supplier_inventory = {
 
 }
 def get_all_supplies() :
+    # requests is imported on first use: after Flask it is the slowest import, and tests,
+    # benchmarks and a preloading server's master never call the supplier
+    import requests
     try:
-        response = requests.get("http://localhost:5001/inventory")
+        response = requests.get(f"{app.config['SUPPLIER_URL']}/inventory", headers=supplier_headers(),
+                                timeout=app.config['SUPPLIER_TIMEOUT'])
         if response.status_code == 200:
             supplier_inventory = response.json()
             return supplier_inventory
@@ -49,8 +94,10 @@ def get_all_supplies() :
     except Exception as e:
         return -1
 def get_supplides (product) :
+    import requests
     try:
-        response = requests.get("http://localhost:5001/inventory")
+        response = requests.get(f"{app.config['SUPPLIER_URL']}/inventory", headers=supplier_headers(),
+                                timeout=app.config['SUPPLIER_TIMEOUT'])
         if response.status_code == 200:
             supplier_inventory = response.json()
             available = supplier_inventory.get(product, 0)
@@ -58,47 +105,290 @@ def get_supplides (product) :
         else : return -1
     except Exception as e:
         return -1
-restock_requests = []
-request_id = 1
+# Per-product locks and the request id allocator live in StoreState (state.py)
+state = StoreState(products)
+restock_requests = state.requests
+restock_index = state.request_index
+# Name, category, below-threshold and stock/threshold ratio indexes for /products/search and
+# /low-stock; updated wherever stock, threshold or category change
+catalog = CatalogIndex(products.values())
+# Units ordered on top of the shortfall below the reorder point
+MIN_ORDER_BUFFER = 4
+lead_times = LeadTimeTracker()
+forecaster = DemandForecaster(lead_times)
+# Supplier request id -> restock request, for matching supplier dispatch events
+supplier_orders = {}
+supplier_event_seq = 0
+# Readings ingested through POST /sensor-readings, the last HISTORY_LEN per product; simulator
+# ticks are read back from the sensor store's raw tier rather than copied here per product
+HISTORY_LEN = 20
 sensor_history = {p: [] for p in products.keys()}
+sensor_last_ts = {p: {} for p in products.keys()}
+# Built by create_app(): the archive creates directories, and the archive, the sensor store and
+# the simulator need NumPy
+sensor_archive = None
+sensor_store = None
+alert_engine = AlertEngine()
+# Rejected, failed and dispatched requests never change again, so their JSON is encoded once
+request_fragments = FragmentCache(app.json, key=lambda r: r.id, is_final=lambda r: r.closed)
+
+# ===================== STATE VERSIONS =====================
+# Every mutation takes the next version; products and requests remember the version of their
+# last change (most recent last) so /dashboard?since= can return just what changed.
+version_counter = itertools.count(1)
+versions_lock = threading.RLock()
+state_version = 0
+stock_version = 0
+requests_version = 0
+sensor_version = 0
+product_versions = OrderedDict((p, 0) for p in products)
+request_versions = OrderedDict()
+
+def bump_version():
+    global state_version
+    with versions_lock:
+        state_version = next(version_counter)
+        return state_version
+
+def touch_product(pname):
+    global stock_version
+    with versions_lock:
+        stock_version = product_versions[pname] = bump_version()
+        product_versions.move_to_end(pname)
+
+def touch_products(pnames):
+    # One version for a whole batch of changed products
+    global stock_version
+    with versions_lock:
+        stock_version = version = bump_version()
+        for pname in pnames:
+            product_versions[pname] = version
+            product_versions.move_to_end(pname)
+
+def touch_request(r):
+    global requests_version
+    with versions_lock:
+        requests_version = request_versions[r.id] = bump_version()
+        request_versions.move_to_end(r.id)
+
+def changed_since(versions, since):
+    changed = []
+    with versions_lock:
+        for key in reversed(versions):
+            if versions[key] <= since:
+                break
+            changed.append(key)
+    return changed[::-1]
+
+def register_product(product):
+    with state.catalog_lock:
+        state.add_product(product)
+        catalog.add(product)
+        sensor_history.setdefault(product.name, [])
+        sensor_last_ts.setdefault(product.name, {})
+        if simulator is not None:
+            simulator.load(products.current)
+    touch_product(product.name)
+
+def load_catalog(new_products):
+    # Bulk upsert of validated products (catalog_io.py), published as one version of the product
+    # table; the catalog index and the simulator arrays are then rebuilt once for the whole batch.
+    # Existing products keep their sales and sensors.
+    with state.catalog_lock:
+        added = []
+        changed = {}
+        for p in new_products:
+            if p.name in products:
+                changed[p.name] = {'stock': p.stock, 'threshold': p.threshold, 'safe_temp': p.safe_temp,
+                                   'safe_humidity': p.safe_humidity, 'category': p.category}
+            else:
+                added.append(p)
+                sensor_history.setdefault(p.name, [])
+                sensor_last_ts.setdefault(p.name, {})
+        with state.locks(changed):
+            snapshot = state.update(changed, added)
+        catalog.rebuild(snapshot.values())
+        if simulator is not None:
+            simulator.load(snapshot)
+    touch_products(p.name for p in new_products)
+
+def apply_config(updates):
+    # name -> validated changes (catalog_io.parse_config) for existing products. The new copies are
+    # published as one version, so readers see all of the batch or none of it, and the catalog index
+    # and simulator bounds are refreshed once.
+    with state.catalog_lock, state.locks(updates):
+        snapshot = state.update(updates)
+        changed = [snapshot[name] for name in updates]
+        catalog.update_many(changed)
+        if simulator is not None:
+            simulator.update_bounds_many((p.name, p.safe_temp, p.safe_humidity) for p in changed)
+    touch_products(updates)
+
+def read_catalog(stream, fmt):
+    products_read, errors, error_count = read_rows(stream, fmt, parse_product, app.json.loads)
+    return list(products_read.values()), errors, error_count
+
+# ===================== CONDITIONAL GET =====================
+# Tags are built from the version counters above; the boot id keeps tags from a previous process from matching
+BOOT_ID = uuid.uuid4().hex[:8]
+
+def matching_etag(tag, req):
+    # The tag (or one of its compressed variants) the client already holds, if any
+    for candidate in [tag] + [f'{tag}-{enc}' for enc in accepted_encodings(req)]:
+        if req.if_none_match.contains(candidate):
+            return candidate
+    return None
+
+def conditional_json(tag, build):
+    # Clients holding the current version get a 304 without the payload being built or serialized
+    tag = f'{BOOT_ID}-{tag}'
+    candidate = matching_etag(tag, request)
+    if candidate is not None:
+        response = app.response_class(status=304)
+        response.set_etag(candidate)
+        return response
+    response = jsonify(build())
+    response.set_etag(tag)
+    return response
+
+def record_history(pname, timestamp, sensors):
+    global sensor_version
+    with state.lock(pname):
+        # Record history (last HISTORY_LEN)
+        sensor_history[pname].append({
+            'timestamp': timestamp,
+            'shelf': sensors['shelf'].to_json(),
+            'inventory': sensors['inventory'].to_json()
+        })
+        if len(sensor_history[pname]) > HISTORY_LEN:
+            sensor_history[pname] = sensor_history[pname][-HISTORY_LEN:]
+    # Bumped after the append: a response built in between is tagged with the old version and
+    # is replaced on the next poll, rather than cached under the new one without the entry
+    with versions_lock:
+        sensor_version = bump_version()
+
+def recent_history(pname):
+    # Ingested entries merged with the product's simulator ticks, newest HISTORY_LEN
+    entries = [{'timestamp': datetime.fromtimestamp(ts).isoformat(), **readings}
+               for ts, readings in sensor_store.recent_ticks(pname, HISTORY_LEN)]
+    entries += sensor_history.get(pname, [])
+    entries.sort(key=lambda entry: entry['timestamp'])
+    return entries[-HISTORY_LEN:]
 
 # ===================== BACKGROUND SENSOR UPDATE =====================
+simulator = None
+
 def update_environment():
     while True:
-        for pname, pdata in products.items():
-            # Get safe bounds
-            t_min, t_max = pdata['safe_temp']
-            h_min, h_max = pdata['safe_humidity']
-
-            # 50% chance to go out of bounds slightly (to trigger alerts)
-            def maybe_outside(value_range, lower_wiggle=2, upper_wiggle=2):
-                if random.random() < 0.5:
-                    return round(random.uniform(value_range[0], value_range[1]), 1)
+        try:
+            sensor_tick()
+        except Exception:
+            # One failed tick (a full disk, say) must not stop the sensor thread for good
+            app.logger.exception('Sensor tick failed')
+        time.sleep(simulator.tick_seconds)
+
+def sensor_tick():
+    global sensor_version
+    with state.catalog_lock:
+        temps, humidity = simulator.tick()
+        snapshot = state.update_sensors(simulator.readings(temps, humidity))
+        index, locations = simulator.index, list(simulator.locations)
+    # The tick is stored and archived as one block of columns, outside the catalog lock
+    ts = time.time()
+    sensor_store.add_tick(ts, index, locations, temps, humidity)
+    if sensor_archive.append_tick(ts, index, locations, temps, humidity):
+        archive_due.set()
+    with versions_lock:
+        sensor_version = bump_version()
+    evaluate_alerts(snapshot, ts)
+    # Versions move after alerts are re-evaluated so a cached response never mixes ticks
+    touch_products(snapshot)
+
+archive_due = threading.Event()
+
+def flush_archive():
+    # Fans the held ticks out to the archive off the sensor thread: one write per series, which
+    # at tens of thousands of products takes longer than a tick
+    while True:
+        archive_due.wait()
+        archive_due.clear()
+        try:
+            sensor_archive.flush_ticks()
+        except Exception:
+            app.logger.exception('Sensor archive flush failed')
+
+
+# ===================== SUPPLIER DISPATCH TRACKING =====================
+def sync_supplier_events():
+    global supplier_event_seq
+    import requests
+    while True:
+        try:
+            response = requests.get(f"{app.config['SUPPLIER_URL']}/request-events", params={'since': supplier_event_seq},
+                                    headers=supplier_headers(), timeout=app.config['SUPPLIER_TIMEOUT'])
+            if response.status_code == 200:
+                feed = response.json()
+                if feed.get('reset') or feed['seq'] < supplier_event_seq:
+                    # Events were lost: this store fell behind the supplier's bounded feed, or the
+                    # supplier restarted and its seq began again
+                    reconcile_supplier_orders(requests)
                 else:
-                    if random.random() < 0.5:
-                        return round(random.uniform(value_range[0] - lower_wiggle, value_range[0] - 0.1), 1)
-                    else:
-                        return round(random.uniform(value_range[1] + 0.1, value_range[1] + upper_wiggle), 1)
-
-            pdata['sensors']['shelf']['temp'] = maybe_outside((t_min, t_max))
-            pdata['sensors']['shelf']['humidity'] = int(maybe_outside((h_min, h_max), 5, 10))
-            pdata['sensors']['inventory']['temp'] = maybe_outside((t_min + 2, t_max + 2))
-            pdata['sensors']['inventory']['humidity'] = int(maybe_outside((h_min, h_max), 5, 10))
-
-            # Record history (last 20)
-            sensor_history[pname].append({
-                'timestamp': datetime.now().isoformat(),
-                'shelf': pdata['sensors']['shelf'].copy(),
-                'inventory': pdata['sensors']['inventory'].copy()
-            })
-            if len(sensor_history[pname]) > 20:
-                sensor_history[pname] = sensor_history[pname][-20:]
-        time.sleep(10)
-
-
-env_thread = threading.Thread(target=update_environment)
-env_thread.daemon = True
-env_thread.start()
+                    for event in feed.get('changes', []):
+                        apply_supplier_status(event['id'], event['to'], event['at'])
+                supplier_event_seq = feed['seq']
+        except Exception:
+            app.logger.exception('Supplier event sync failed')
+        time.sleep(5)
+
+def apply_supplier_status(supplier_id, status, at):
+    r = supplier_orders.get(supplier_id)
+    if r is None:
+        return
+    if status == 'Dispatched':
+        with state.lock(r.product):
+            state.set_dispatched(r, datetime.fromisoformat(at).timestamp())
+            touch_request(r)
+        lead_times.record(r.product, r.timestamp, r.decision_time, r.dispatched_at)
+    elif status in ('Rejected', 'Failed - Out of stock'):
+        with state.lock(r.product):
+            record_supplier_failure(r, f"Supplier: {status}")
+            touch_request(r)
+    if status in ('Dispatched', 'Rejected', 'Failed - Out of stock'):
+        del supplier_orders[supplier_id]
+
+def reconcile_supplier_orders(requests):
+    # Brings each open supplier order up to its current status from the supplier's request list.
+    # An order it no longer knows (lost in a restart) will never be dispatched: it is marked Failed,
+    # so it stops counting as on order. Orders sent after the snapshot below are left alone.
+    expected = list(supplier_orders)
+    response = requests.get(f"{app.config['SUPPLIER_URL']}/export/requests.ndjson", headers=supplier_headers(),
+                            timeout=app.config['SUPPLIER_TIMEOUT'], stream=True)
+    with response:
+        response.raise_for_status()
+        known = set()
+        for line in response.iter_lines():
+            if line:
+                order = app.json.loads(line)
+                if order['id'] in supplier_orders:
+                    known.add(order['id'])
+                    apply_supplier_status(order['id'], order['status'], order['dispatched_at'])
+    for supplier_id in expected:
+        r = supplier_orders.get(supplier_id)
+        if r is not None and supplier_id not in known:
+            del supplier_orders[supplier_id]
+            with state.lock(r.product):
+                record_supplier_failure(r, 'Supplier no longer has this order')
+                touch_request(r)
+
+
+# ===================== RESTOCK REQUESTS =====================
+def create_restock_request(product, quantity):
+    # One supplier availability check per coalesced decision
+    supplier_available = get_supplides(product)
+    if supplier_available > 0:
+        touch_request(state.add_request(product, min(quantity, supplier_available), time.time()))
+
+restock_coalescer = None
 
 # ===================== ROUTES =====================
 @app.route('/')
@@ -107,7 +397,6 @@ def index():
 
 @app.route('/stock', methods=['GET', 'POST'])
 def manage_stock():
-    global request_id
     if request.method == 'POST':
         data = request.get_json()
         product = data.get('product')
@@ -116,103 +405,295 @@ def manage_stock():
         if product not in products or new_stock < 0:
             return jsonify({'error': 'Invalid data'}), 400
 
-        old_stock = products[product]['stock']
-        products[product]['stock'] = new_stock
-
-        if old_stock > new_stock:
-            products[product]['sales'] += (old_stock - new_stock)
-
-        needed_qty = max(0, products[product]['threshold'] - products[product]['stock'])
-        pending_qty = sum(r['quantity'] for r in restock_requests if r['product'] == product
-                          and (r['status'] == 'Pending' or r['status']=='Approved'))
-        supplier_available = get_supplides(product)
-        additional_supplies_requested_const = 4
-        requested_supplies = needed_qty - pending_qty + additional_supplies_requested_const if needed_qty-pending_qty>0 else 0
-        if needed_qty > pending_qty and supplier_available > 0 :
-            restock_requests.append({
-                'id': request_id,
-                'product': product,
-                'quantity': min(requested_supplies, supplier_available),
-                'status': 'Pending',
-                'timestamp': datetime.now().isoformat(),
-                'comment': ""
-            })
-            request_id += 1
-
-        return jsonify({product: products[product]})
-
-    return jsonify(products)
+        with state.lock(product):
+            pdata = products[product]
+            changes = {'stock': new_stock}
+            if pdata.stock > new_stock:
+                changes['sales'] = pdata.sales + (pdata.stock - new_stock)
+                forecaster.record_sale(product, pdata.stock - new_stock)
+            pdata = state.update({product: changes})[product]
+            catalog.update(pdata)
+            touch_product(product)
+
+            # Reorder when stock plus pending falls below the larger of the configured
+            # threshold and the forecast demand over the supplier lead time
+            reorder_point = max(pdata.threshold, forecaster.reorder_point(product))
+            pending_qty = state.pending_quantity(product) + restock_coalescer.pending(product)
+            position = pdata.stock + pending_qty
+            if position < reorder_point:
+                requested_supplies = max(forecaster.order_quantity(product, position),
+                                         math.ceil(reorder_point - position) + MIN_ORDER_BUFFER)
+                restock_coalescer.offer(product, requested_supplies)
+
+            return jsonify({product: pdata})
+
+    # The tag and the payload come from the same snapshot
+    snapshot = products.current
+    return conditional_json(f'stock-{snapshot.version}', lambda: snapshot)
+
+SEARCH_LIMIT = 50
+SEARCH_MAX_LIMIT = 500
+
+@app.route('/products/search')
+def search_products():
+    try:
+        limit = min(int(request.args.get('limit', SEARCH_LIMIT)), SEARCH_MAX_LIMIT)
+        offset = int(request.args.get('offset', 0))
+    except ValueError:
+        return jsonify({'error': 'Invalid limit/offset'}), 400
+    if limit < 0 or offset < 0:
+        return jsonify({'error': 'Invalid limit/offset'}), 400
+    q = request.args.get('q', '')
+    category = request.args.get('category') or None
+    below_threshold = request.args.get('below_threshold', '').lower() in ('1', 'true', 'yes')
+
+    def build():
+        total, names = catalog.search(q, category, below_threshold, limit, offset)
+        snapshot = products.current
+        return {'total': total, 'products': [{'name': n, **snapshot[n].to_json()} for n in names]}
+
+    return conditional_json(f'search-{stock_version}-{request.query_string.decode()}', build)
+
+@app.route('/low-stock')
+def low_stock():
+    # Products at or below their threshold, most depleted (lowest stock/threshold) first
+    try:
+        limit = min(int(request.args.get('limit', SEARCH_LIMIT)), SEARCH_MAX_LIMIT)
+    except ValueError:
+        return jsonify({'error': 'Invalid limit'}), 400
+    if limit < 0:
+        return jsonify({'error': 'Invalid limit'}), 400
+
+    def build():
+        snapshot = products.current
+        return [{'name': n, 'ratio': round(ratio, 4), **snapshot[n].to_json()}
+                for n, ratio in catalog.low_stock(limit)]
+
+    return conditional_json(f'low-stock-{stock_version}-{limit}', build)
+
+@app.route('/forecast')
+def get_forecast():
+    product = request.args.get('product')
+    if product is not None and product not in products:
+        return jsonify({'error': 'Invalid product'}), 400
+    names = [product] if product else list(products)
+    return jsonify({p: forecaster.summary(p) for p in names})
+
+@app.route('/lead-times')
+def get_lead_times():
+    product = request.args.get('product')
+    if product is not None and product not in products:
+        return jsonify({'error': 'Invalid product'}), 400
+    names = [product] if product else list(products)
+    return jsonify({p: lead_times.summary(p) for p in names})
+
+# Ids of requests waiting on the supplier for a decision. A request is claimed under its product
+# lock, so one approved from two tabs at once is only sent once, while the supplier calls
+# themselves run without the lock
+deciding = set()
+
+def decide_request(r, action, comment):
+    # Returns False when the request was already decided or is being decided
+    with state.lock(r.product):
+        if r.status != 'Pending' or r.id in deciding:
+            return False
+        deciding.add(r.id)
+    try:
+        # ✅ Step 1: Query supplier inventory via HTTP
+        available = get_supplides(r.product)
+        with state.lock(r.product):
+            approved = apply_decision(r, action, comment, available)
+        if not approved:
+            return True
+
+        # ✅ Step 4: Send request to supplier if approved
+        import requests
+        try:
+            send_response = requests.post(f"{app.config['SUPPLIER_URL']}/new-request", json=supplier_payload(r),
+                                          headers=supplier_headers(), timeout=app.config['SUPPLIER_TIMEOUT'])
+            supplier_id = send_response.json().get('id') if send_response.status_code == 200 else None
+            with state.lock(r.product):
+                record_supplier_reply(r, send_response.status_code, supplier_id)
+        except Exception as e:
+            with state.lock(r.product):
+                record_supplier_failure(r, f"Failed to contact supplier: {e}")
+        return True
+    finally:
+        with state.lock(r.product):
+            deciding.discard(r.id)
+
+# Steps 2-4 without the HTTP calls, shared with the async build (app_async.py); run under the
+# product lock
+def apply_decision(r, action, comment, available):
+    # Returns True when the request was approved and should be sent to the supplier
+    if r.status != 'Pending':
+        # Decided elsewhere while the supplier was being asked
+        return False
+    if available ==-1 :
+        r.comment += 'could finish supplier inventory request '
+        return False
+    # ✅ Step 2: Decide based on availability
+    if action == 'approve' and available <= 0:
+        r.comment += " | Skipped: no supplier stock available."
+        return False
+
+    # ✅ Step 3: Update status
+    # Status goes last: a rejection closes the request, and GET /requests (which reads without the
+    # product lock) must not cache its fragment before the comment and decision time are set
+    r.comment = comment
+    r.decision_time = time.time()
+    state.set_status(r, 'Approved' if action == 'approve' else 'Rejected')
+    return r.status == 'Approved'
+
+def supplier_payload(r):
+    return {
+        "id": r.id,
+        "product": r.product,
+        "quantity": r.quantity,
+        "store": {
+            "name": "Retail Store #1",
+            "phone": "+1234567890",
+            "address": "123 Main St, Retail City"
+        }
+    }
+
+def supplier_headers():
+    return {'X-Store-Id': app.config['STORE_ID']}
+
+def record_supplier_reply(r, status_code, supplier_id):
+    if status_code == 200:
+        r.comment += " | Sent to supplier."
+        r.supplier_id = supplier_id
+        supplier_orders[r.supplier_id] = r
+    else:
+        # 429 included: left Approved, the request would count as on order forever
+        record_supplier_failure(r, f"Supplier error: {status_code}")
+
+def record_supplier_failure(r, reason):
+    # The supplier never took the order: it stops counting as pending stock, so the next
+    # below-threshold sale orders again
+    r.comment += f" | {reason}"
+    state.set_status(r, 'Failed')
 
 @app.route('/requests', methods=['GET', 'POST'])
 def handle_requests():
-    global request_id
     if request.method == 'POST':
         data = request.get_json()
         req_id = data.get('id')
         action = data.get('action')
         comment = data.get('comment', '')
 
-        for r in restock_requests:
-            if r['id'] == req_id and r['status'] == 'Pending':
-                product = r['product']
-                quantity = r['quantity']
-
-                # ✅ Step 1: Query supplier inventory via HTTP
-                available = get_supplides(product)
-                if available ==-1 :
-                    r['comment'] += 'could finish supplier inventory request '
-                    break
-                # ✅ Step 2: Decide based on availability
-                if action == 'approve' and available <= 0:
-                    r['comment'] += " | Skipped: no supplier stock available."
-                    break
-
-                # ✅ Step 3: Update status
-                r['status'] = 'Approved' if action == 'approve' else 'Rejected'
-                r['comment'] = comment
-                r['decision_time'] = datetime.now().isoformat()
-
-                # ✅ Step 4: Send request to supplier if approved
-                if r['status'] == 'Approved':
-                    try:
-                        supplier_payload = {
-                            "id": req_id,
-                            "product": product,
-                            "quantity": quantity,
-                            "store": {
-                                "name": "Retail Store #1",
-                                "phone": "+1234567890",
-                                "address": "123 Main St, Retail City"
-                            }
-                        }
-                        supplier_url = "http://localhost:5001/new-request"
-                        send_response = requests.post(supplier_url, json=supplier_payload)
-                        if send_response.status_code == 200:
-                            r['comment'] += " | Sent to supplier."
-                        else:
-                            r['comment'] += f" | Supplier error: {send_response.status_code}"
-                    except Exception as e:
-                        r['comment'] += f" | Failed to contact supplier: {e}"
-                break
+        r = restock_index.get(req_id)
+        if r is not None and decide_request(r, action, comment):
+            touch_request(r)
+        return jsonify(request_fragments.array(restock_requests))
+
+    return conditional_json(f'requests-{requests_version}', lambda: request_fragments.array(restock_requests))
+def request_counts():
+    # Kept by StoreState on every status change rather than counted per poll
+    counts = state.status_counts
+    return {
+        'total': len(restock_requests),
+        'pending': counts['Pending'],
+        'approved': counts['Approved'],
+        'rejected': counts['Rejected'],
+        'failed': counts['Failed'],
+    }
+
+def analytics_tag(supplier):
+    supplier_tag = hash(tuple(sorted(supplier.items()))) if isinstance(supplier, dict) else supplier
+    return f'analytics-{stock_version}-{requests_version}-{alert_engine.seq}-{supplier_tag & 0xffffffff}'
+
+def analytics_payload(supplier):
+    snapshot = products.current
+    return {
+        **request_counts(),
+        'sales': {p: v.sales for p, v in snapshot.items()},
+        'stock': {p: v.stock for p, v in snapshot.items()},
+        'supplier': supplier,
+        'sensors': {p: v.sensors for p, v in snapshot.items()},
+        'alerts': check_environment_alerts(snapshot)
+    }
 
-    return jsonify(restock_requests)
 @app.route('/analytics')
 def analytics():
-    return jsonify({
-        'total': len(restock_requests),
-        'pending': sum(1 for r in restock_requests if r['status'] == 'Pending'),
-        'approved': sum(1 for r in restock_requests if r['status'] == 'Approved'),
-        'rejected': sum(1 for r in restock_requests if r['status'] == 'Rejected'),
-        'sales': {p: v['sales'] for p, v in products.items()},
-        'stock': {p: v['stock'] for p, v in products.items()},
-        'supplier': get_all_supplies(),
-        'sensors': {p: v['sensors'] for p, v in products.items()},
-        'alerts': check_environment_alerts()
-    })
+    supplier = get_all_supplies()
+    return conditional_json(analytics_tag(supplier), lambda: analytics_payload(supplier))
+
+# Most recent restock requests in a full dashboard payload, which also carries every older request
+# still open, so each one a manager can act on is listed; closed older ones are left out
+DASHBOARD_REQUESTS = 200
+
+@app.route('/dashboard')
+def dashboard():
+    try:
+        since = dashboard_since(request.args.get('since'))
+    except ValueError:
+        return jsonify({'error': 'Invalid since'}), 400
+    return jsonify(dashboard_payload(since, get_all_supplies()))
+
+def dashboard_since(token):
+    # A payload's version token is "<BOOT_ID>-<version>". Versions restart with the process, so a
+    # token from another one (or a bare number) asks for a full payload
+    if token is None:
+        return None
+    boot, _, version = token.rpartition('-')
+    version = int(version)
+    return version if boot == BOOT_ID else None
+
+def dashboard_payload(since, supplier):
+    # Read the version first: anything changing while the payload is built is resent next poll
+    version = state_version
+    snapshot = products.current
+    if since is not None and since > version:
+        since = None
+
+    if since is None:
+        stock = snapshot
+        recent = restock_requests[-DASHBOARD_REQUESTS:]
+        changed_requests = state.open_before(recent[0].id) + recent if recent else []
+    else:
+        stock = {p: snapshot[p] for p in changed_since(product_versions, since)}
+        changed_requests = [restock_index[i] for i in changed_since(request_versions, since)]
+
+    return {
+        'version': f'{BOOT_ID}-{version}',
+        'since': since,
+        'stock': stock,
+        'requests': request_fragments.array(changed_requests),
+        'analytics': {**request_counts(), 'supplier': supplier},
+        'alerts': check_environment_alerts(snapshot)
+    }
+
+RESOLUTIONS = {'raw': 0, '1m': 60, '15m': 900}
 
 @app.route('/sensor-history')
 def get_sensor_history():
-    return jsonify(sensor_history)
+    product = request.args.get('product')
+    if product is None:
+        return conditional_json(f'sensors-{sensor_version}',
+                                lambda: {pname: recent_history(pname) for pname in products.current})
+    if product not in products:
+        return jsonify({'error': 'Invalid product'}), 400
+
+    try:
+        end = parse_ts(request.args['to']) if 'to' in request.args else time.time()
+        start = parse_ts(request.args['from']) if 'from' in request.args else end - 3600
+        resolution = request.args.get('resolution')
+        if resolution is not None:
+            resolution = RESOLUTIONS[resolution] if resolution in RESOLUTIONS else float(resolution)
+    except ValueError:
+        return jsonify({'error': 'Invalid from/to/resolution'}), 400
+
+    def build():
+        # The raw hour is answered from memory, the rollup tiers from the on-disk archive
+        step, points = sensor_store.query(product, start, end, resolution)
+        return {'product': product, 'from': start, 'to': end, 'resolution': step, 'points': points}
+
+    # Without an explicit `to` the window slides with the clock, so only fixed windows are cacheable
+    if 'to' not in request.args:
+        return jsonify(build())
+    return conditional_json(f'sensors-{sensor_version}-{request.query_string.decode()}', build)
 
 @app.route('/config', methods=['POST'])
 def update_config():
@@ -220,30 +701,142 @@ def update_config():
     product = data.get('product')
     if product not in products:
         return jsonify({'error': 'Invalid product'}), 400
+    try:
+        _, changes = parse_config(data)
+    except (ValueError, TypeError, KeyError):
+        return jsonify({'error': 'Invalid data'}), 400
 
-    products[product]['threshold'] = data.get('threshold', products[product]['threshold'])
-    products[product]['safe_temp'] = tuple(data.get('safe_temp', products[product]['safe_temp']))
-    products[product]['safe_humidity'] = tuple(data.get('safe_humidity', products[product]['safe_humidity']))
+    apply_config({product: changes})
     return jsonify({'message': 'Updated successfully'})
 
+@app.route('/config/batch', methods=['POST'])
+def update_config_batch():
+    # A JSON list of /config bodies, or {"updates": [...]}; all validated first, then applied
+    # together or not at all. Errors give the 1-based position of the update as "line".
+    data = request.get_json()
+    if isinstance(data, dict):
+        data = data.get('updates')
+    if not isinstance(data, list):
+        return jsonify({'error': 'Expected a list of updates'}), 400
+
+    def parse(row):
+        name, changes = parse_config(row)
+        if name not in products:
+            raise ValueError(f'unknown product {name!r}')
+        return name, changes
+
+    start = time.perf_counter()
+    updates, errors, error_count = collect(enumerate(data, 1), parse)
+    if error_count:
+        return jsonify({'error': 'Invalid updates', 'invalid': error_count, 'errors': errors}), 400
+    apply_config(updates)
+    return jsonify({'updated': len(updates), 'seconds': round(time.perf_counter() - start, 3)})
+
+# ===================== SENSOR INGESTION =====================
+# Seconds a gateway's clock may run ahead of ours. A reading further in the future would make
+# every real reading after it look late, and is persisted as the series' newest timestamp
+MAX_CLOCK_SKEW = 60
+
+def parse_ts(ts):
+    if isinstance(ts, str):
+        try:
+            return float(ts)
+        except ValueError:
+            return datetime.fromisoformat(ts).timestamp()
+    if isinstance(ts, bool) or not isinstance(ts, (int, float)):
+        raise ValueError('ts must be epoch seconds or an ISO timestamp')
+    return ts
+
+def parse_reading(r):
+    if not isinstance(r, dict):
+        raise ValueError('Reading must be an object')
+    product = r.get('product')
+    location = r.get('location')
+    if product not in products:
+        raise ValueError(f'Unknown product: {product}')
+    if location not in products[product].sensors:
+        raise ValueError(f'Unknown location: {location}')
+    temp = r.get('temp')
+    humidity = r.get('humidity')
+    for value in (temp, humidity):
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+            raise ValueError('temp and humidity must be finite numbers')
+    ts = r.get('ts')
+    now = time.time()
+    ts = now if ts is None else parse_ts(ts)
+    # Also false for NaN
+    if not 0 <= ts <= now + MAX_CLOCK_SKEW:
+        raise ValueError(f'ts must be between the epoch and {MAX_CLOCK_SKEW} seconds from now')
+    return product, location, ts, temp, humidity
+
+@app.route('/sensor-readings', methods=['POST'])
+def ingest_sensor_readings():
+    global sensor_version
+    data = request.get_json(silent=True)
+    readings = data.get('readings') if isinstance(data, dict) else data
+    if not isinstance(readings, list):
+        return jsonify({'error': 'Expected a list of readings'}), 400
+
+    parsed = []
+    rejected = []
+    for i, r in enumerate(readings):
+        try:
+            parsed.append(parse_reading(r))
+        except ValueError as e:
+            rejected.append({'index': i, 'error': str(e)})
+
+    latest = {}
+    newest = {}
+    # The request's products stay locked until its readings are published, as one version, so a
+    # concurrent request's newer reading is never overwritten
+    with state.locks(r[0] for r in parsed):
+        for product, location, ts, temp, humidity in parsed:
+            sensor_store.add(product, location, ts, temp, humidity)
+            sensor_archive.append(product, location, ts, temp, humidity)
+            # Late readings from a gateway never overwrite a newer value
+            if ts < sensor_last_ts[product].get(location, float('-inf')):
+                continue
+            sensor_last_ts[product][location] = ts
+            newest.setdefault(product, {})[location] = SensorReading(temp, humidity)
+            latest[product] = max(ts, latest.get(product, ts))
+        snapshot = state.update_sensors(newest) if newest else products.current
+
+    for pname, ts in latest.items():
+        record_history(pname, datetime.fromtimestamp(ts).isoformat(), snapshot[pname].sensors)
+        evaluate_alerts([pname], ts)
+        touch_product(pname)
+    if parsed and not latest:
+        # Only late readings: they still reach the series /sensor-history serves, so its cached
+        # responses must go stale as well
+        with versions_lock:
+            sensor_version = bump_version()
+
+    return jsonify({'accepted': len(parsed), 'rejected': rejected, 'products': list(latest)})
+
 # ===================== ALERT CHECK =====================
-def check_environment_alerts():
-    alerts = {}
-    for pname, pdata in products.items():
-        alerts[pname] = []
+def evaluate_alerts(pnames, ts=None):
+    ts = time.time() if ts is None else ts
+    snapshot = products.current
+    for pname in pnames:
+        pdata = snapshot[pname]
         for loc in ['shelf', 'inventory']:
-            sensor = pdata['sensors'].get(loc, {})
-            temp = sensor.get('temp')
-            humidity = sensor.get('humidity')
-            if temp is None or humidity is None:
+            sensor = pdata.sensors.get(loc)
+            if sensor is None:
                 continue
-            min_temp, max_temp = pdata['safe_temp']
-            min_h, max_h = pdata['safe_humidity']
-            if not (min_temp <= temp <= max_temp):
-                alerts[pname].append(f"{loc.capitalize()} temp out of range: {temp}°C")
-            if not (min_h <= humidity <= max_h):
-                alerts[pname].append(f"{loc.capitalize()} humidity out of range: {humidity}%")
-    return alerts
+            alert_engine.evaluate(pname, loc, 'temp', sensor.temp, pdata.safe_temp, ts)
+            alert_engine.evaluate(pname, loc, 'humidity', sensor.humidity, pdata.safe_humidity, ts)
+
+def check_environment_alerts(snapshot=None):
+    return alert_engine.messages(products.current if snapshot is None else snapshot)
+
+@app.route('/alerts')
+def alert_changes():
+    try:
+        since = int(request.args.get('since', 0))
+    except ValueError:
+        return jsonify({'error': 'Invalid since'}), 400
+    return jsonify(alert_engine.changes(since))
+
 @app.route('/report-environment', methods=['POST'])
 def report_environment():
     data = request.get_json()
@@ -255,13 +848,129 @@ def report_environment():
     # Simulate resolving environmental issues (adjust temp/humidity back to normal)
     def resolve_env():
         for _ in range(3):
-            products[product]['sensors']['shelf']['temp'] = round(random.uniform(*products[product]['safe_temp']), 1)
-            products[product]['sensors']['shelf']['humidity'] = random.randint(*products[product]['safe_humidity'])
+            with state.lock(product):
+                pdata = products[product]
+                state.update_sensors({product: {'shelf': SensorReading(round(random.uniform(*pdata.safe_temp), 1),
+                                                                       random.randint(*pdata.safe_humidity))}})
+                evaluate_alerts([product])
+                touch_product(product)
             time.sleep(5)
 
     threading.Thread(target=resolve_env).start()
 
     return jsonify({'message': f'Environmental issue reported for {product}, auto-adjustment started.'})
 
+# ===================== CATALOG IMPORT/EXPORT =====================
+@app.route('/catalog/import', methods=['POST'])
+def import_catalog():
+    # Streamed CSV or JSON Lines body (?format=, or Content-Type text/csv); all or nothing
+    try:
+        fmt = stream_format(request.args.get('format'), request.mimetype)
+    except ValueError:
+        return jsonify({'error': 'Invalid format'}), 400
+    start = time.perf_counter()
+    new_products, errors, error_count = read_catalog(text_stream(request.stream), fmt)
+    if error_count:
+        return jsonify({'error': 'Invalid rows', 'invalid': error_count, 'errors': errors}), 400
+    load_catalog(new_products)
+    return jsonify({'imported': len(new_products), 'products': len(products),
+                    'seconds': round(time.perf_counter() - start, 3)})
+
+@app.route('/catalog/export')
+def export_catalog():
+    try:
+        fmt = stream_format(request.args.get('format'), None)
+    except ValueError:
+        return jsonify({'error': 'Invalid format'}), 400
+    # Snapshots are immutable, so the export streams from one without copying it
+    snapshot = products.current.values()
+    if fmt == 'csv':
+        return app.response_class(csv_chunks(snapshot), mimetype='text/csv')
+    return ndjson_response(app, map(catalog_row, snapshot))
+
+# ===================== EXPORTS =====================
+@app.route('/export/requests.ndjson')
+def export_requests():
+    try:
+        start, end = time_range(request.args)
+    except ValueError:
+        return jsonify({'error': 'Invalid from/to'}), 400
+    return ndjson_response(app, in_range(restock_requests, start, end, lambda r: r.timestamp))
+
+@app.route('/export/sensors.ndjson')
+def export_sensors():
+    # Archived raw readings, one product/location at a time in time order; lines have the
+    # same shape POST /sensor-readings accepts
+    pnames = request.args.getlist('product') or list(products)
+    if any(p not in products for p in pnames):
+        return jsonify({'error': 'Invalid product'}), 400
+    locations = request.args.getlist('location')
+    try:
+        start, end = time_range(request.args)
+    except ValueError:
+        return jsonify({'error': 'Invalid from/to'}), 400
+
+    def readings():
+        for pname in pnames:
+            for loc in locations or sensor_archive.locations(pname):
+                for chunk in sensor_archive.iter_rows(pname, loc, start, end):
+                    for ts, temp, humidity in chunk:
+                        yield {'product': pname, 'location': loc, 'ts': ts, 'temp': temp, 'humidity': humidity}
+
+    return ndjson_response(app, readings())
+
+# ===================== APP FACTORY =====================
+# State is module-level, so there is one app per process: the first call applies config and builds
+# the engines, later calls return the same app. Importing this module has no side effects.
+factory_lock = threading.Lock()
+
+def create_app(config=None):
+    global sensor_archive, sensor_store, simulator, restock_coalescer
+    with factory_lock:
+        if simulator is not None:
+            if config:
+                raise RuntimeError('create_app() already built the app; pass config to the first call')
+            return app
+        app.config.update(config or {})
+        if app.config['CATALOG_PATH']:
+            path = app.config['CATALOG_PATH']
+            with open(path, encoding='utf-8', newline='') as f:
+                new_products, errors, error_count = read_catalog(f, 'csv' if path.endswith('.csv') else 'jsonl')
+            if error_count:
+                raise ValueError(f'{path}: {error_count} invalid rows, first: {errors[0]}')
+            load_catalog(new_products)
+        # NumPy is only loaded here, not at import
+        from archive import SensorArchive
+        from simulation import SensorSimulator
+        from timeseries import SensorStore
+        sensor_archive = SensorArchive(app.config['SENSOR_ARCHIVE_DIR'])
+        sensor_store = SensorStore(sensor_archive)
+        restock_coalescer = RestockCoalescer(create_restock_request, app.config['RESTOCK_COALESCE_SECONDS'])
+        simulator = SensorSimulator(products.current, seed=app.config['SENSOR_SEED'],
+                                    tick_seconds=app.config['SENSOR_TICK_SECONDS'])
+    return app
+
+# ===================== BACKGROUND THREADS =====================
+# Started by whoever serves the app (python app.py, serve.py, app_async.py), never at import: a
+# preloading server imports this module once in a parent that forks workers, and threads do not
+# survive a fork. Calling it again in the same process is a no-op.
+background_lock = threading.Lock()
+background_started = False
+
+def start_background():
+    global background_started
+    create_app()
+    with background_lock:
+        if background_started:
+            return False
+        for target in (update_environment, flush_archive, sync_supplier_events, restock_coalescer.run):
+            threading.Thread(target=target, daemon=True).start()
+        background_started = True
+    return True
+
 if __name__ == '__main__':
+    # With debug=True the reloader serves from a child process; the watching parent stays idle
+    create_app()
+    if is_running_from_reloader():
+        start_background()
     app.run(debug=True)
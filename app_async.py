@@ -0,0 +1,176 @@
+# Async (ASGI) build of the store service
+# The routes that wait on the supplier (/dashboard, /analytics, /requests) run as Quart coroutines
+# and call supplier.py through one pooled httpx.AsyncClient, so thousands of open dashboard and till
+# connections share one event loop instead of a thread each. Every other route is app.py's Flask
+# view, served from a small thread pool. State and background threads are app.py's; the threads
+# start when the server starts serving.
+#
+# Run: uvicorn app_async:asgi --port 5000   (or: hypercorn app_async:asgi --bind 127.0.0.1:5000)
+
+import asyncio
+import os
+
+import httpx
+from asgiref.wsgi import WsgiToAsgi
+from quart import Quart, jsonify, request
+
+import app as store
+from compression import accepted_encodings, compress
+from jsonprovider import init_json
+
+SUPPLIER_MAX_CONNECTIONS = int(os.environ.get('SUPPLIER_MAX_CONNECTIONS', 20))
+ASYNC_PATHS = {'/dashboard', '/analytics', '/requests'}
+
+app = Quart(__name__)
+init_json(app)
+
+
+class SupplierClient:
+    def __init__(self, base_url, timeout, headers=None, max_connections=SUPPLIER_MAX_CONNECTIONS):
+        self.client = httpx.AsyncClient(
+            base_url=base_url, timeout=timeout, headers=headers,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections))
+        self._inventory = None
+
+    async def inventory(self):
+        # Single flight: polls arriving while an inventory request is in the air share its answer
+        if self._inventory is None:
+            self._inventory = asyncio.ensure_future(self._fetch_inventory())
+            self._inventory.add_done_callback(self._inventory_done)
+        return await asyncio.shield(self._inventory)
+
+    def _inventory_done(self, future):
+        if self._inventory is future:
+            self._inventory = None
+
+    async def _fetch_inventory(self):
+        # Same contract as app.get_all_supplies: the inventory dict, or -1 when the supplier is unreachable
+        try:
+            response = await self.client.get('/inventory')
+            return response.json() if response.status_code == 200 else -1
+        except Exception:
+            return -1
+
+    async def available(self, product):
+        inventory = await self.inventory()
+        return inventory.get(product, 0) if isinstance(inventory, dict) else -1
+
+    async def submit(self, payload):
+        return await self.client.post('/new-request', json=payload)
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+supplier = None
+# Requests with a decision awaiting the supplier; coroutines share one thread, so the product
+# RLocks cannot keep two of them from deciding the same request
+deciding = set()
+
+
+@app.before_serving
+async def open_supplier_client():
+    global supplier
+    config = store.create_app().config
+    supplier = SupplierClient(config['SUPPLIER_URL'], config['SUPPLIER_TIMEOUT'], store.supplier_headers())
+    store.start_background()
+
+
+@app.after_serving
+async def close_supplier_client():
+    await supplier.aclose()
+
+
+@app.after_request
+async def compress_response(response):
+    # Async twin of compression.init_compression (Quart bodies are read with await)
+    if response.status_code != 200 or response.mimetype != 'application/json' or 'Content-Encoding' in response.headers:
+        return response
+    response.vary.add('Accept-Encoding')
+    encodings = accepted_encodings(request)
+    data = await response.get_data()
+    if not encodings or len(data) < 1024:
+        return response
+    response.set_data(compress(data, encodings[0]))
+    response.headers['Content-Encoding'] = encodings[0]
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(f'{etag}-{encodings[0]}')
+    return response
+
+
+def conditional_json(tag, build):
+    tag = f'{store.BOOT_ID}-{tag}'
+    candidate = store.matching_etag(tag, request)
+    if candidate is not None:
+        response = app.response_class('', status=304)
+        response.set_etag(candidate)
+        return response
+    response = jsonify(build())
+    response.set_etag(tag)
+    return response
+
+
+# ===================== ROUTES =====================
+@app.route('/dashboard')
+async def dashboard():
+    try:
+        since = store.dashboard_since(request.args.get('since'))
+    except ValueError:
+        return jsonify({'error': 'Invalid since'}), 400
+    return jsonify(store.dashboard_payload(since, await supplier.inventory()))
+
+
+@app.route('/analytics')
+async def analytics():
+    inventory = await supplier.inventory()
+    return conditional_json(store.analytics_tag(inventory), lambda: store.analytics_payload(inventory))
+
+
+@app.route('/requests', methods=['GET', 'POST'])
+async def handle_requests():
+    if request.method == 'POST':
+        data = await request.get_json()
+        r = store.restock_index.get(data.get('id'))
+        if r is not None and r.status == 'Pending' and r.id not in deciding:
+            deciding.add(r.id)
+            try:
+                await decide_request(r, data.get('action'), data.get('comment', ''))
+                store.touch_request(r)
+            finally:
+                deciding.discard(r.id)
+        return jsonify(store.request_fragments.array(store.restock_requests))
+
+    return conditional_json(f'requests-{store.requests_version}',
+                            lambda: store.request_fragments.array(store.restock_requests))
+
+
+async def decide_request(r, action, comment):
+    available = await supplier.available(r.product)
+    # Threads (dispatch events, the coalescer) still share these records, so state changes
+    # happen under the product lock, but never across an await
+    with store.state.lock(r.product):
+        approved = store.apply_decision(r, action, comment, available)
+    if not approved:
+        return
+    try:
+        response = await supplier.submit(store.supplier_payload(r))
+        supplier_id = response.json().get('id') if response.status_code == 200 else None
+        with store.state.lock(r.product):
+            store.record_supplier_reply(r, response.status_code, supplier_id)
+    except Exception as e:
+        # Not only transport errors: a 200 that is not the expected JSON would otherwise leave the
+        # request Approved with no supplier id, on order forever (same as app.py)
+        with store.state.lock(r.product):
+            store.record_supplier_failure(r, f"Failed to contact supplier: {e}")
+
+
+# ===================== ASGI ENTRY =====================
+flask_app = WsgiToAsgi(store.app)
+
+
+async def asgi(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'] not in ASYNC_PATHS:
+        await flask_app(scope, receive, send)
+    else:
+        await app(scope, receive, send)
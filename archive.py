@@ -0,0 +1,431 @@
+# Append-only columnar on-disk archive for sensor readings
+# One directory per product/location holding fixed-width ts/temp/humidity column files.
+# Rows are buffered and written in blocks; reads go through numpy.memmap so range
+# queries and rollups over months of history never load it onto the heap. Each memmap holds a
+# file descriptor, so maps are opened per query and released with its arrays; an idle series
+# holds none, however many series there are.
+# Simulator ticks arrive as one (products x locations) block each; they are kept as blocks and
+# fanned out to the per-series buffers once per flush interval rather than row by row. The fan-out
+# works on blocks already swapped out of the held list, so new ticks and readers never wait on it.
+# Each series also keeps rollup tiers (1-minute and 15-minute buckets of count/min/max/sum), folded
+# in as each block is written: closed buckets are appended to the tier's file, the one still filling
+# stays in memory. Rollup queries read a tier instead of re-bucketing the raw rows.
+
+import atexit
+import itertools
+import os
+import struct
+import threading
+import time
+from urllib.parse import quote, unquote
+
+import numpy as np
+
+COLUMNS = (('ts', np.float64), ('temp', np.float32), ('humidity', np.float32))
+BLOCK_ROWS = 1024
+FLUSH_SECONDS = 60
+EXPORT_CHUNK_ROWS = 4096
+# Bucket widths, in seconds, of the rollup tiers kept per series
+ROLLUP_STEPS = (60, 900)
+# One fixed-width record per bucket; ts is the bucket start, a multiple of the step
+BUCKET = np.dtype([('ts', np.float64), ('count', np.uint32),
+                   ('temp_min', np.float32), ('temp_max', np.float32), ('temp_sum', np.float64),
+                   ('humidity_min', np.float32), ('humidity_max', np.float32), ('humidity_sum', np.float64)])
+# The same record for packing a few buckets at a time without building arrays
+BUCKET_RECORD = struct.Struct('<dIffdffd')
+
+
+def combine(records, step):
+    # Merges bucket records, sorted by ts, into `step` buckets (the same step, or a multiple of it)
+    if not len(records):
+        return records
+    keys = records['ts'] - records['ts'] % step
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    out = np.empty(len(starts), BUCKET)
+    out['ts'] = keys[starts]
+    out['count'] = np.add.reduceat(records['count'], starts)
+    for name in ('temp', 'humidity'):
+        out[f'{name}_min'] = np.minimum.reduceat(records[f'{name}_min'], starts)
+        out[f'{name}_max'] = np.maximum.reduceat(records[f'{name}_max'], starts)
+        out[f'{name}_sum'] = np.add.reduceat(records[f'{name}_sum'], starts)
+    return out
+
+
+def row_buckets(ts, temp, humidity, step):
+    # `step` buckets of rows sorted by ts
+    records = np.empty(len(ts), BUCKET)
+    records['ts'] = ts
+    records['count'] = 1
+    for name, col in (('temp', temp), ('humidity', humidity)):
+        records[f'{name}_min'] = records[f'{name}_max'] = records[f'{name}_sum'] = col
+    return combine(records, step)
+
+
+class ColumnSeries:
+    def __init__(self, path, block_rows=BLOCK_ROWS, flush_seconds=FLUSH_SECONDS, steps=ROLLUP_STEPS):
+        self.path = path
+        self.block_rows = block_rows
+        self.flush_seconds = flush_seconds
+        self.steps = steps
+        # Per step, the newest bucket, still filling and not yet in the tier file (count 0: none)
+        self.filling = np.zeros(len(steps), BUCKET)
+        self.buffer = []
+        self.last_flush = time.time()
+        self.last_ts = float('-inf')
+        # Newest tick block timestamp fanned out into this series; held blocks up to it are
+        # already in the buffer or on disk
+        self.fanned_ts = float('-inf')
+        self.late = 0
+        self.lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+        rows = self._rows()
+        if rows:
+            # The last complete row's timestamp, read without mapping the column
+            with open(self._file('ts'), 'rb') as f:
+                f.seek((rows - 1) * np.dtype(np.float64).itemsize)
+                self.last_ts = float(np.frombuffer(f.read(np.dtype(np.float64).itemsize), np.float64)[0])
+        for k in range(len(steps)):
+            self._catch_up(k, rows)
+
+    def _file(self, name):
+        return os.path.join(self.path, name + '.col')
+
+    def _tier_file(self, step):
+        return os.path.join(self.path, f'rollup-{step}.rec')
+
+    def _tier(self, step):
+        path = self._tier_file(step)
+        buckets = os.path.getsize(path) // BUCKET.itemsize if os.path.exists(path) else 0
+        if buckets == 0:
+            return np.empty(0, BUCKET)
+        return np.memmap(path, dtype=BUCKET, mode='r', shape=(buckets,))
+
+    def _catch_up(self, k, rows):
+        # Rebuilds the filling bucket, and any closed ones the tier file is missing (a crash between
+        # the raw and the tier write, or an archive written before the tiers existed), from the raw
+        # rows after the tier's last bucket
+        step = self.steps[k]
+        path = self._tier_file(step)
+        if os.path.exists(path) and os.path.getsize(path) % BUCKET.itemsize:
+            # A torn record write; later appends must stay record-aligned
+            os.truncate(path, os.path.getsize(path) // BUCKET.itemsize * BUCKET.itemsize)
+        tier = self._tier(step)
+        after = float(tier['ts'][-1]) + step if len(tier) else float('-inf')
+        del tier
+        if rows:
+            cols = {name: self._column(name, rows) for name, _ in COLUMNS}
+            lo = np.searchsorted(cols['ts'], after, side='left')
+            if lo < rows:
+                buckets = row_buckets(cols['ts'][lo:], cols['temp'][lo:], cols['humidity'][lo:], step)
+                with open(path, 'ab') as f:
+                    f.write(buckets[:-1].tobytes())
+                self.filling[k] = buckets[-1]
+
+    def _rows(self):
+        # A torn block write leaves columns of different lengths; only complete rows are readable
+        rows = []
+        for name, dtype in COLUMNS:
+            size = os.path.getsize(self._file(name)) if os.path.exists(self._file(name)) else 0
+            rows.append(size // np.dtype(dtype).itemsize)
+        return min(rows)
+
+    def _column(self, name, rows):
+        dtype = dict(COLUMNS)[name]
+        if rows == 0:
+            return np.empty(0, dtype)
+        return np.memmap(self._file(name), dtype=dtype, mode='r', shape=(rows,))
+
+    # ===================== WRITE =====================
+    def append(self, ts, temp, humidity):
+        with self.lock:
+            # Blocks are time-ordered on disk; readings older than the last written block are counted, not stored
+            if ts < self.last_ts:
+                self.late += 1
+                return
+            self.buffer.append((ts, temp, humidity))
+            if len(self.buffer) >= self.block_rows or time.time() - self.last_flush >= self.flush_seconds:
+                self._flush()
+
+    def extend(self, rows):
+        # Buffers a run of tick rows (oldest first) without flushing; the caller flushes once it
+        # has filled every series
+        with self.lock:
+            kept = [row for row in rows if row[0] >= self.last_ts]
+            self.late += len(rows) - len(kept)
+            self.buffer.extend(kept)
+            if rows:
+                self.fanned_ts = max(self.fanned_ts, rows[-1][0])
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def _flush(self):
+        self.last_flush = time.time()
+        if not self.buffer:
+            return
+        self.buffer.sort(key=lambda row: row[0])
+        rows = np.array(self.buffer, dtype=[(name, dtype) for name, dtype in COLUMNS])
+        for name, _ in COLUMNS:
+            with open(self._file(name), 'ab') as f:
+                f.write(np.ascontiguousarray(rows[name]).tobytes())
+        self.last_ts = float(rows['ts'][-1])
+        self.buffer = []
+        # As stored (float32), so the tiers match buckets computed from the columns
+        rows = rows.tolist()
+        for k in range(len(self.steps)):
+            self._roll(k, rows)
+
+    def _roll(self, k, rows):
+        # Folds rows, sorted and newer than every rolled one, into tier k: the buckets they close
+        # are appended to its file, and the newest stays filling. A block holds a few rows per
+        # series, so this is plain Python rather than a dozen array calls per tier
+        step = self.steps[k]
+        bucket = self.filling[k].item() if self.filling[k]['count'] else None
+        closed = []
+        for ts, temp, humidity in rows:
+            key = ts - ts % step
+            if bucket is not None and bucket[0] == key:
+                _, count, temp_min, temp_max, temp_sum, hum_min, hum_max, hum_sum = bucket
+                bucket = (key, count + 1, min(temp_min, temp), max(temp_max, temp), temp_sum + temp,
+                          min(hum_min, humidity), max(hum_max, humidity), hum_sum + humidity)
+            else:
+                if bucket is not None:
+                    closed.append(BUCKET_RECORD.pack(*bucket))
+                bucket = (key, 1, temp, temp, temp, humidity, humidity, humidity)
+        if closed:
+            with open(self._tier_file(step), 'ab') as f:
+                f.write(b''.join(closed))
+        self.filling[k] = bucket
+
+    # ===================== READ =====================
+    def columns(self):
+        # Fresh memmaps of the flushed blocks; their descriptors close once the arrays are dropped
+        rows = self._rows()
+        return {name: self._column(name, rows) for name, _ in COLUMNS}
+
+    def range(self, start, end):
+        cols = self.columns()
+        lo = np.searchsorted(cols['ts'], start, side='left')
+        hi = np.searchsorted(cols['ts'], end, side='right')
+        return {name: cols[name][lo:hi] for name, _ in COLUMNS}
+
+    def capture(self, start, end, pending=()):
+        # The flushed range and the unflushed rows (buffered here, or `pending` in the archive's
+        # tick blocks) are captured together, so a concurrent flush neither drops nor repeats rows.
+        # Unflushed rows are all newer than the flushed ones; pending rows that are not would be
+        # counted late when fanned out, so they are left out here too, as are pending rows the
+        # fan-out has already moved into this series.
+        with self.lock:
+            cols = self.range(start, end)
+            pending = [row for row in pending if row[0] > self.fanned_ts]
+            unflushed = sorted(row for row in itertools.chain(self.buffer, pending)
+                               if start <= row[0] <= end and row[0] >= self.last_ts)
+        return cols, unflushed
+
+    def tier_step(self, step):
+        # The coarsest tier whose buckets add up to `step` buckets, or None
+        return max((s for s in self.steps if step % s == 0), default=None)
+
+    def capture_tier(self, start, end, step, pending=()):
+        # Like capture(), for the whole `step` buckets starting in [start, end], read from the tier
+        # tier_step(step): its closed buckets, the filling one, and the rows not yet rolled into it
+        k = self.steps.index(self.tier_step(step))
+        first = start - start % step
+        stop = end - end % step + step
+        with self.lock:
+            tier = self._tier(self.steps[k])
+            lo = np.searchsorted(tier['ts'], first, side='left')
+            hi = np.searchsorted(tier['ts'], stop, side='left')
+            closed = tier[lo:hi]
+            filling = self.filling[k:k + 1]
+            filling = filling[(filling['count'] > 0) & (filling['ts'] >= first) & (filling['ts'] < stop)]
+            pending = [row for row in pending if row[0] > self.fanned_ts]
+            unflushed = sorted(row for row in itertools.chain(self.buffer, pending)
+                               if first <= row[0] < stop and row[0] >= self.last_ts)
+        return closed, filling, unflushed
+
+    def iter_rows(self, start, end, chunk_rows=EXPORT_CHUNK_ROWS):
+        return self.chunks(*self.capture(start, end), chunk_rows)
+
+    def rollup(self, start, end, step):
+        if self.tier_step(step) is not None:
+            return self.tier_points(*self.capture_tier(start, end, step), step)
+        return self.buckets(*self.capture(start, end), start, end, step)
+
+    @staticmethod
+    def chunks(cols, unflushed, chunk_rows=EXPORT_CHUNK_ROWS):
+        # Flushed rows are read a chunk at a time
+        for lo in range(0, len(cols['ts']), chunk_rows):
+            hi = lo + chunk_rows
+            yield list(zip(cols['ts'][lo:hi].tolist(),
+                           cols['temp'][lo:hi].astype(np.float64).round(2).tolist(),
+                           cols['humidity'][lo:hi].astype(np.float64).round(2).tolist()))
+        if unflushed:
+            yield unflushed
+
+    @staticmethod
+    def tier_points(closed, filling, unflushed, step):
+        # Closed and filling buckets come before the unflushed rows' buckets; combine() merges the
+        # one they may share, and coarsens the tier's buckets when `step` is a multiple of its step
+        parts = [np.asarray(closed), filling]
+        if unflushed:
+            ts, temp, humidity = zip(*unflushed)
+            parts.append(row_buckets(np.array(ts, np.float64), np.array(temp, np.float32),
+                                     np.array(humidity, np.float32), step))
+        records = combine(np.concatenate(parts), step)
+        # Rounded as arrays, so the per-bucket work is only building the dicts
+        stats = [np.stack([records[f'{name}_min'].astype(np.float64), records[f'{name}_max'].astype(np.float64),
+                           records[f'{name}_sum'] / records['count']], axis=1).round(2).tolist()
+                 for name in ('temp', 'humidity')]
+        return [{'ts': ts, 'count': count,
+                 'temp': dict(zip(('min', 'max', 'mean'), temp)),
+                 'humidity': dict(zip(('min', 'max', 'mean'), humidity))}
+                for ts, count, temp, humidity in zip(records['ts'].tolist(), records['count'].tolist(), *stats)]
+
+    @staticmethod
+    def buckets(cols, unflushed, start, end, step):
+        # Unflushed rows are newer than every flushed one, so appending them keeps ts sorted and
+        # the newest buckets are complete rather than waiting for the next flush
+        if unflushed:
+            extra = np.array(unflushed, dtype=[(name, dtype) for name, dtype in COLUMNS])
+            cols = {name: np.concatenate([cols[name], extra[name]]) for name, _ in COLUMNS}
+        ts = cols['ts']
+        if not len(ts):
+            return []
+        # ts is sorted, so bucket boundaries are a searchsorted over the bucket edges
+        first = start - start % step
+        edges = np.arange(first, end + step, step)
+        bounds = np.searchsorted(ts, edges, side='left')
+        starts = bounds[:-1]
+        nonempty = starts < bounds[1:]
+        starts = starts[nonempty]
+        counts = (bounds[1:] - bounds[:-1])[nonempty]
+        stats = {}
+        for name in ('temp', 'humidity'):
+            col = cols[name]
+            stats[name] = (np.minimum.reduceat(col, starts), np.maximum.reduceat(col, starts),
+                           np.add.reduceat(col.astype(np.float64), starts) / counts)
+        points = []
+        for i, bucket in enumerate(edges[:-1][nonempty].tolist()):
+            points.append({
+                'ts': bucket,
+                'count': int(counts[i]),
+                'temp': {k: round(float(v[i]), 2) for k, v in zip(('min', 'max', 'mean'), stats['temp'])},
+                'humidity': {k: round(float(v[i]), 2) for k, v in zip(('min', 'max', 'mean'), stats['humidity'])},
+            })
+        return points
+
+
+class SensorArchive:
+    def __init__(self, root, block_rows=BLOCK_ROWS, flush_seconds=FLUSH_SECONDS, steps=ROLLUP_STEPS):
+        self.root = root
+        self.block_rows = block_rows
+        self.flush_seconds = flush_seconds
+        self.steps = steps
+        self.series = {}
+        self.lock = threading.Lock()
+        # Simulator ticks not yet fanned out, as (ts, index, locations, temps, humidity), and the
+        # ones flush_ticks() is fanning out; tick_lock guards both lists, not the fan-out itself
+        self.ticks = []
+        self.fanning = []
+        self.tick_lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        atexit.register(self.flush)
+
+    def get(self, product, location):
+        key = (product, location)
+        series = self.series.get(key)
+        if series is None:
+            with self.lock:
+                series = self.series.get(key)
+                if series is None:
+                    path = os.path.join(self.root, quote(product, safe=''), quote(location, safe=''))
+                    series = self.series[key] = ColumnSeries(path, self.block_rows, self.flush_seconds, self.steps)
+        return series
+
+    def append(self, product, location, ts, temp, humidity):
+        self.get(product, location).append(ts, temp, humidity)
+
+    def append_tick(self, ts, index, locations, temps, humidity):
+        # One simulator tick: (products x locations) arrays, `index` mapping a product to its row.
+        # Only held here; returns True once the held ticks are due for flush_ticks(), which writes
+        # every series and so belongs off the thread producing the ticks
+        with self.tick_lock:
+            self.ticks.append((ts, index, tuple(locations), temps, humidity))
+            return len(self.ticks) >= self.block_rows or ts - self.ticks[0][0] >= self.flush_seconds
+
+    def flush_ticks(self):
+        # Fans the held ticks out to their series in one pass per run of ticks sharing a catalog,
+        # then writes each series once. The ticks are swapped into `fanning` and tick_lock is
+        # released, so append_tick() and readers only wait for the swap; readers see each row as
+        # pending until its series has it (ColumnSeries.fanned_ts), and as buffered after.
+        with self.flush_lock:
+            with self.tick_lock:
+                ticks = self.fanning = self.ticks
+                self.ticks = []
+            touched = []
+            for _, run in itertools.groupby(ticks, key=lambda tick: (id(tick[1]), tick[2])):
+                run = list(run)
+                ts = [tick[0] for tick in run]
+                _, index, locations, _, _ = run[0]
+                # (products, locations, ticks) nested lists, so each series' rows are one zip
+                temps = np.stack([tick[3] for tick in run], axis=-1).tolist()
+                humidity = np.stack([tick[4] for tick in run], axis=-1).tolist()
+                for product, i in index.items():
+                    for j, location in enumerate(locations):
+                        series = self.get(product, location)
+                        series.extend(list(zip(ts, temps[i][j], humidity[i][j])))
+                        touched.append(series)
+            with self.tick_lock:
+                self.fanning = []
+            for series in touched:
+                series.flush()
+
+    def _pending(self, product, location, start, end):
+        # Rows of one series still held in tick blocks; called under tick_lock
+        rows = []
+        for ts, index, locations, temps, humidity in itertools.chain(self.fanning, self.ticks):
+            i = index.get(product)
+            if i is not None and location in locations and start <= ts <= end:
+                j = locations.index(location)
+                rows.append((ts, float(temps[i, j]), float(humidity[i, j])))
+        return rows
+
+    def _capture(self, product, location, start, end):
+        series = self.get(product, location)
+        with self.tick_lock:
+            return series.capture(start, end, self._pending(product, location, start, end))
+
+    def _rollup(self, product, location, start, end, step):
+        series = self.get(product, location)
+        if series.tier_step(step) is None:
+            return ColumnSeries.buckets(*self._capture(product, location, start, end), start, end, step)
+        with self.tick_lock:
+            captured = series.capture_tier(start, end, step,
+                                           self._pending(product, location, start - start % step, end + step))
+        return ColumnSeries.tier_points(*captured, step)
+
+    def flush(self):
+        self.flush_ticks()
+        for series in list(self.series.values()):
+            series.flush()
+
+    def locations(self, product):
+        path = os.path.join(self.root, quote(product, safe=''))
+        found = {unquote(name) for name in os.listdir(path)} if os.path.isdir(path) else set()
+        with self.tick_lock:
+            # A series first seen in the held ticks has no directory until they are fanned out
+            for _, index, locations, _, _ in (self.ticks or self.fanning)[-1:]:
+                if product in index:
+                    found.update(locations)
+        return sorted(found)
+
+    def iter_rows(self, product, location, start, end, chunk_rows=EXPORT_CHUNK_ROWS):
+        if location not in self.locations(product):
+            return iter(())
+        return ColumnSeries.chunks(*self._capture(product, location, start, end), chunk_rows)
+
+    def rollup(self, product, start, end, step):
+        # Whole buckets from a rollup tier when `step` is a multiple of one, else from the raw rows
+        return {loc: self._rollup(product, loc, start, end, step) for loc in self.locations(product)}
@@ -0,0 +1,136 @@
+# Benchmark: /dashboard request rate, threaded Flask server vs the async (ASGI) build
+# Starts a supplier stub with a fixed response delay, then each store server in a subprocess, and
+# drives GET /dashboard?since= from a pool of concurrent keep-alive clients.
+# Run from the repo root: python benchmarks/async_store.py [seconds] [supplier_delay_ms]
+# Needs uvicorn and httpx (the async build's dependencies).
+
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STUB_PORT = 5101
+STORE_PORT = 5100
+CONCURRENCY = (10, 100, 500, 1000)
+REQUEST_TIMEOUT = 30
+
+
+async def supplier_stub(scope, receive, send):
+    # Answers like supplier.py after SUPPLIER_DELAY seconds
+    if scope['type'] != 'http':
+        return
+    await asyncio.sleep(float(os.environ.get('SUPPLIER_DELAY', 0.02)))
+    if scope['path'] == '/inventory':
+        body = {'Milk': 20, 'Bread': 15, 'Eggs': 30}
+    elif scope['path'] == '/request-events':
+        body = {'seq': 0, 'reset': False, 'changes': []}
+    else:
+        body = {'message': 'Request received', 'id': 'stub'}
+    await send({'type': 'http.response.start', 'status': 200, 'headers': [(b'content-type', b'application/json')]})
+    await send({'type': 'http.response.body', 'body': json.dumps(body).encode()})
+
+
+def start(args, env):
+    process = subprocess.Popen(args, cwd=ROOT, env={**os.environ, **env},
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            if httpx.get(f'http://127.0.0.1:{env["PORT"]}/dashboard?since=0', timeout=1).status_code < 500:
+                return process
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f'{args} did not start')
+
+
+async def get(reader, writer, request):
+    # Minimal HTTP/1.1 GET: the load generator shares the CPU with the servers, so it stays light.
+    # Returns the status and whether the server keeps the connection open.
+    writer.write(request)
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    keep_alive = True
+    while (line := await reader.readline()) not in (b'\r\n', b''):
+        name, _, value = line.partition(b':')
+        name = name.lower()
+        if name == b'content-length':
+            length = int(value)
+        elif name == b'connection' and value.strip().lower() == b'close':
+            keep_alive = False
+    await reader.readexactly(length)
+    return status, keep_alive
+
+
+async def load(port, concurrency, seconds):
+    version = httpx.get(f'http://127.0.0.1:{port}/dashboard').json()['version']
+    request = f'GET /dashboard?since={version} HTTP/1.1\r\nHost: 127.0.0.1\r\n\r\n'.encode()
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + seconds
+
+    async def worker():
+        nonlocal errors
+        reader = writer = None
+        while time.perf_counter() < deadline:
+            start_ts = time.perf_counter()
+            try:
+                if writer is None:
+                    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+                status, keep_alive = await asyncio.wait_for(get(reader, writer, request), REQUEST_TIMEOUT)
+                if status == 200:
+                    latencies.append(time.perf_counter() - start_ts)
+                else:
+                    errors += 1
+            except (OSError, ValueError, IndexError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+                errors += 1
+                keep_alive = False
+            if not keep_alive and writer is not None:
+                writer.close()
+                writer = None
+        if writer is not None:
+            writer.close()
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99)] if latencies else float('nan')
+    return len(latencies) / seconds, p99, errors
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+    delay_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 20
+    env = {'SUPPLIER_URL': f'http://127.0.0.1:{STUB_PORT}', 'SUPPLIER_DELAY': str(delay_ms / 1000),
+           'SENSOR_ARCHIVE_DIR': tempfile.mkdtemp()}
+    stub = subprocess.Popen([sys.executable, '-m', 'uvicorn', '--app-dir', 'benchmarks', 'async_store:supplier_stub',
+                             '--port', str(STUB_PORT), '--log-level', 'warning', '--backlog', '4096'],
+                            cwd=ROOT, env={**os.environ, **env})
+    servers = (
+        ('threaded Flask', [sys.executable, '-c',
+                            f'import app; app.start_background(); app.app.run(port={STORE_PORT}, threaded=True)']),
+        ('async (uvicorn)', [sys.executable, '-m', 'uvicorn', 'app_async:asgi', '--port', str(STORE_PORT),
+                             '--log-level', 'warning', '--backlog', '4096']),
+    )
+    print(f"GET /dashboard?since=, supplier delay {delay_ms:.0f} ms, {seconds:.0f}s per level")
+    try:
+        for label, args in servers:
+            process = start(args, {**env, 'PORT': str(STORE_PORT)})
+            try:
+                for concurrency in CONCURRENCY:
+                    rate, p99, errors = asyncio.run(load(STORE_PORT, concurrency, seconds))
+                    print(f"{label:>16} c={concurrency:<5}: {rate:8,.0f} req/s  p99 {p99 * 1000:8.1f} ms  {errors} errors")
+            finally:
+                process.terminate()
+                process.wait()
+    finally:
+        stub.terminate()
+
+
+if __name__ == '__main__':
+    main()
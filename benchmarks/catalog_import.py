@@ -0,0 +1,82 @@
+# Benchmark: bulk catalog load time per 100k rows, CSV and JSON Lines
+# Each file is parsed and validated in one streamed pass, then applied with the catalog index and
+# simulator arrays built once. The per-insert row loads a small batch through register_product,
+# which rebuilds the simulator arrays for every product, for comparison.
+# Run from the repo root: python benchmarks/catalog_import.py [rows] [per_insert_rows]
+
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as store
+from catalog_io import CSV_FIELDS
+
+CATEGORIES = ['Dairy', 'Bakery', 'Produce', 'Frozen', 'Beverages', 'Snacks', 'Household', 'Meat']
+
+
+def rows(n, prefix, rng):
+    for i in range(n):
+        t = rng.randint(-20, 20)
+        h = rng.randint(20, 60)
+        yield (f'{prefix}-{i:07d}', rng.choice(CATEGORIES), rng.randint(0, 500), rng.randint(5, 50),
+               t, t + rng.randint(2, 10), h, h + rng.randint(10, 30))
+
+
+def write_csv(path, n, prefix, rng):
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        f.write(','.join(CSV_FIELDS) + '\n')
+        for r in rows(n, prefix, rng):
+            f.write(','.join(map(str, r)) + '\n')
+
+
+def write_jsonl(path, n, prefix, rng):
+    with open(path, 'w', encoding='utf-8') as f:
+        for name, category, stock, threshold, t_lo, t_hi, h_lo, h_hi in rows(n, prefix, rng):
+            f.write(json.dumps({'name': name, 'category': category, 'stock': stock, 'threshold': threshold,
+                                'safe_temp': [t_lo, t_hi], 'safe_humidity': [h_lo, h_hi]}) + '\n')
+
+
+def load(path, fmt):
+    start = time.perf_counter()
+    with open(path, encoding='utf-8', newline='') as f:
+        products, errors, error_count = store.read_catalog(f, fmt)
+    parsed = time.perf_counter()
+    assert not error_count, errors
+    store.load_catalog(products)
+    return len(products), parsed - start, time.perf_counter() - parsed
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 300000
+    per_insert = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    rng = random.Random(5)
+    root = tempfile.mkdtemp()
+    store.create_app({'SENSOR_ARCHIVE_DIR': root})
+    print(f"{n:,} rows per file; times per 100k rows")
+    for fmt, write in (('csv', write_csv), ('jsonl', write_jsonl)):
+        path = os.path.join(root, f'catalog.{fmt}')
+        write(path, n, fmt.upper(), rng)
+        count, parse_s, apply_s = load(path, fmt)
+        scale = 100000 / count
+        print(f"  {fmt:>5}: parse + validate {parse_s * scale:5.2f}s  apply + index {apply_s * scale:5.2f}s  "
+              f"total {(parse_s + apply_s) * scale:5.2f}s  ({len(store.products):,} products loaded)")
+
+    path = os.path.join(root, 'small.csv')
+    write_csv(path, per_insert, 'ONE', rng)
+    with open(path, encoding='utf-8', newline='') as f:
+        products, _, _ = store.read_catalog(f, 'csv')
+    start = time.perf_counter()
+    for p in products:
+        store.register_product(p)
+    seconds = time.perf_counter() - start
+    print(f"  per-insert register_product: {per_insert:,} rows in {seconds:.2f}s on a "
+          f"{len(store.products) - per_insert:,}-product catalog ({seconds / per_insert * 1000:.1f} ms/row)")
+
+
+if __name__ == '__main__':
+    main()
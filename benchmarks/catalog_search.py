@@ -0,0 +1,81 @@
+# Benchmark: product search from the catalog indexes vs a scan of the products dict
+# Run from the repo root: python benchmarks/catalog_search.py [skus] [queries]
+
+import os
+import random
+import sys
+import time
+from dataclasses import replace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from catalog import LOW_RATIO, CatalogIndex, stock_ratio
+from records import Product, SensorReading
+
+CATEGORIES = ['Dairy', 'Bakery', 'Produce', 'Frozen', 'Beverages', 'Snacks', 'Household', 'Meat',
+              'Deli', 'Pantry', 'Personal Care', 'Baby', 'Pet', 'Seafood', 'Canned', 'Spices',
+              'Breakfast', 'International', 'Health', 'Floral']
+QUERIES = (
+    ('prefix', {'q': 'sku-0123'}),
+    ('category', {'category': 'Seafood'}),
+    ('below threshold', {'below_threshold': True}),
+    ('prefix + category + low', {'q': 'sku-01', 'category': 'Dairy', 'below_threshold': True}),
+)
+
+
+def make_products(n, rng):
+    products = {}
+    for i in range(n):
+        name = f'SKU-{i:06d}'
+        threshold = rng.randint(5, 50)
+        # About 2% of the catalog is at or below its threshold
+        stock = rng.randint(0, threshold) if rng.random() < 0.02 else rng.randint(threshold + 1, 500)
+        products[name] = Product(name, stock, threshold, (2, 8), (30, 90),
+                                 {'shelf': SensorReading(5.0, 50)}, category=rng.choice(CATEGORIES))
+    return products
+
+
+def scan(products, q='', category=None, below_threshold=False, limit=50, offset=0):
+    q = q.casefold()
+    names = sorted((p.name for p in products.values()
+                    if p.name.casefold().startswith(q)
+                    and (category is None or p.category.casefold() == category.casefold())
+                    and (not below_threshold or stock_ratio(p) <= LOW_RATIO)),
+                   key=lambda n: (n.casefold(), n))
+    return len(names), names[offset:offset + limit]
+
+
+def timed(fn, queries):
+    start = time.perf_counter()
+    for _ in range(queries):
+        result = fn()
+    return (time.perf_counter() - start) / queries, result
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    queries = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    rng = random.Random(7)
+    products = make_products(n, rng)
+
+    start = time.perf_counter()
+    catalog = CatalogIndex(products.values())
+    print(f"{n:,} SKUs, index built in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    for label, args in QUERIES:
+        indexed, result = timed(lambda: catalog.search(**args), queries)
+        scanned, expected = timed(lambda: scan(products, **args), max(1, queries // 20))
+        assert result == expected, label
+        print(f"{label:>24}: {result[0]:6,} matches  index {indexed * 1e6:8.1f} us  "
+              f"scan {scanned * 1e6:10.1f} us  ({scanned / indexed:,.0f}x)")
+
+    names = list(products)
+    start = time.perf_counter()
+    for name in rng.choices(names, k=100000):
+        p = products[name] = replace(products[name], stock=rng.randint(0, 500))
+        catalog.update(p)
+    print(f"{'stock write + index update':>24}: {(time.perf_counter() - start) / 100000 * 1e6:.2f} us")
+
+
+if __name__ == '__main__':
+    main()
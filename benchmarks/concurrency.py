@@ -0,0 +1,108 @@
+# Stress benchmark: concurrent POST /stock and POST /requests with per-product vs global locking
+# Reports throughput and lost updates (sales double-counted, requests sent to the supplier twice);
+# tests/test_concurrency.py runs the same rounds and requires none to be lost.
+# Run from the repo root: python benchmarks/concurrency.py [threads] [products] [rounds] [requests]
+
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as store
+from records import Product, SensorReading
+
+INITIAL_STOCK = 1000
+SUPPLIER_LATENCY = 0.002   # simulated round-trip for each supplier call
+
+
+class SupplierStub:
+    # Stands in for the supplier service so decisions cost a realistic round-trip without a server
+    def __init__(self):
+        self.sent = []
+
+    def available(self, product):
+        time.sleep(SUPPLIER_LATENCY)
+        return 10 ** 6
+
+    def post(self, url, json, **kwargs):
+        time.sleep(SUPPLIER_LATENCY)
+        self.sent.append(json['id'])
+        return mock.Mock(status_code=200, json=lambda: {'id': f"s{json['id']}"})
+
+
+def add_products(n):
+    names = [f'P{i}' for i in range(n)]
+    for name in names:
+        if name not in store.products:
+            store.register_product(Product(name, INITIAL_STOCK, 0, (2, 8), (30, 90),
+                                           {'shelf': SensorReading(5.0, 50), 'inventory': SensorReading(5.0, 50)}))
+    return names
+
+
+def stock_rounds(names, threads, rounds):
+    # Each round every thread sets its product to the same lower value at once: serially only the
+    # first write is a sale, so a racing read-modify-write shows up as extra sales
+    store.state.update({name: {'stock': INITIAL_STOCK, 'sales': 0} for name in names})
+    barrier = threading.Barrier(threads)
+
+    def worker(t):
+        client = store.app.test_client()
+        name = names[t % len(names)]
+        for r in range(rounds):
+            barrier.wait()
+            client.post('/stock', json={'product': name, 'stock': INITIAL_STOCK - r - 1})
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(worker, range(threads)))
+    seconds = time.perf_counter() - start
+    lost = sum(1 for n in names if store.products[n].sales != INITIAL_STOCK - store.products[n].stock)
+    return threads * rounds / seconds, lost
+
+
+def decisions(names, threads, count, supplier):
+    # Every pending request is approved by two clients at once; it must reach the supplier once
+    ids = [store.state.add_request(names[i % len(names)], 5, time.time()).id for i in range(count)]
+    supplier.sent.clear()
+    local = threading.local()
+
+    def approve(req_id):
+        if not hasattr(local, 'client'):
+            local.client = store.app.test_client()
+        local.client.post('/requests', json={'id': req_id, 'action': 'approve', 'comment': ''})
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(approve, [i for i in ids for _ in range(2)]))
+    seconds = time.perf_counter() - start
+    duplicates = len(supplier.sent) - len(set(supplier.sent))
+    undecided = sum(1 for i in ids if store.restock_index[i].status != 'Approved')
+    return count / seconds, duplicates + undecided
+
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    n_products = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    rounds = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+    count = int(sys.argv[4]) if len(sys.argv) > 4 else 200
+
+    store.create_app()
+    supplier = SupplierStub()
+    store.get_supplides = supplier.available
+    names = add_products(n_products)
+    print(f"{threads} threads, {n_products} products, {rounds} stock rounds, {count} requests approved twice each")
+    with mock.patch('requests.post', supplier.post):
+        for label, global_lock in (('per-product locks', False), ('global lock', True)):
+            store.state.global_lock = global_lock
+            stock_rate, lost_sales = stock_rounds(names, threads, rounds)
+            decision_rate, lost_decisions = decisions(names, threads, count, supplier)
+            print(f"{label:>18}: POST /stock {stock_rate:8,.0f}/s ({lost_sales} lost) | "
+                  f"POST /requests {decision_rate:6,.0f} decisions/s ({lost_decisions} lost)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+# Benchmark: bytes transferred and CPU per dashboard poll with ETags and compression
+# Run from the repo root: python benchmarks/conditional_get.py [restock_requests] [polls]
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as store
+
+
+def seed_requests(n):
+    for i in range(n):
+        r = store.state.add_request('Milk' if i % 2 else 'Bread', 5 + i % 7, 1767225600.0)
+        store.state.set_status(r, ('Pending', 'Approved', 'Rejected')[i % 3])
+        r.comment = ' | Sent to supplier.' if i % 3 == 1 else ''
+        store.touch_request(r)
+
+
+def poll(client, path, polls, headers):
+    sent = 0
+    status = None
+    cpu = time.process_time()
+    for _ in range(polls):
+        res = client.get(path, headers=headers)
+        sent += len(res.data)
+        status = res.status_code
+    return status, sent / polls, (time.process_time() - cpu) / polls
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    polls = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    seed_requests(n)
+    client = store.create_app().test_client()
+
+    print(f"GET /requests with {n} restock requests, {polls} polls each")
+    etag = client.get('/requests').headers['ETag']
+    gz_etag = client.get('/requests', headers={'Accept-Encoding': 'gzip'}).headers['ETag']
+    cases = (
+        ('plain', {}),
+        ('gzip', {'Accept-Encoding': 'gzip'}),
+        ('If-None-Match', {'If-None-Match': etag}),
+        ('gzip + If-None-Match', {'Accept-Encoding': 'gzip', 'If-None-Match': gz_etag}),
+    )
+    for label, headers in cases:
+        status, size, cpu = poll(client, '/requests', polls, headers)
+        print(f"{label:>22}: {status} {size:>10,.0f} bytes/poll {cpu * 1000:8.2f} ms CPU/poll")
+
+
+if __name__ == '__main__':
+    main()
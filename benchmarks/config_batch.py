@@ -0,0 +1,94 @@
+# Benchmark: many config updates as single POST /config calls vs one POST /config/batch
+# Singles refresh the simulator bounds once per call; the batch once in total. A reader thread
+# walks the products without taking a lock while whole-batch threshold changes are applied, and
+# counts walks that saw part of a batch: one published version per batch vs one per product.
+# Run from the repo root: python benchmarks/config_batch.py [products] [updates]
+
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as store
+from records import Product, SensorReading
+
+
+def make_products(n, rng):
+    return [Product(f'SKU-{i:06d}', rng.randint(0, 500), rng.randint(5, 50), (2, 8), (30, 90),
+                    {'shelf': SensorReading(5.0, 50), 'inventory': SensorReading(5.0, 50)}, category='Dairy')
+            for i in range(n)]
+
+
+def torn_walks(write, names, rounds):
+    # Applies `rounds` batches that each set one threshold on every name, while a reader checks that
+    # all the names it sees in one walk share a threshold
+    write(999)
+    done = threading.Event()
+    walks = torn = 0
+
+    def reader():
+        nonlocal walks, torn
+        while not done.is_set():
+            table = store.products.current
+            if len({table[name].threshold for name in names}) > 1:
+                torn += 1
+            walks += 1
+
+    thread = threading.Thread(target=reader)
+    thread.start()
+    for value in range(rounds):
+        write(1000 + value)
+        time.sleep(0.001)
+    done.set()
+    thread.join()
+    return torn, walks
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    k = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    rng = random.Random(11)
+    store.create_app({'SENSOR_ARCHIVE_DIR': tempfile.mkdtemp()})
+    store.load_catalog(make_products(n, rng))
+    client = store.app.test_client()
+    names = rng.sample(sorted(store.products), k)
+
+    def update(name):
+        t = rng.randint(-5, 5)
+        return {'product': name, 'threshold': rng.randint(5, 50), 'safe_temp': [t, t + 6]}
+
+    singles = names[:k // 10]
+    start = time.perf_counter()
+    for name in singles:
+        assert client.post('/config', json=update(name)).status_code == 200
+    single_s = (time.perf_counter() - start) / len(singles)
+
+    start = time.perf_counter()
+    response = client.post('/config/batch', json=[update(name) for name in names])
+    batch_s = time.perf_counter() - start
+    assert response.get_json()['updated'] == k
+    print(f"{len(store.products):,} products, {k:,} updates")
+    print(f"  single /config: {single_s * 1000:6.2f} ms/update  ({single_s * k:.2f}s for all {k:,})")
+    print(f"  /config/batch:  {batch_s * 1000 / k:6.3f} ms/update  ({batch_s:.2f}s in one request)")
+
+    watched = names[:200]
+
+    def per_product(value):
+        # Separate requests: other threads run between them
+        for name in watched:
+            store.state.update({name: {'threshold': value}})
+            time.sleep(0)
+
+    torn, walks = torn_walks(lambda value: store.apply_config({name: {'threshold': value} for name in watched}),
+                             watched, 200)
+    print(f"  one version per batch:   {torn:,} of {walks:,} lock-free walks saw a half-applied batch")
+    torn, walks = torn_walks(per_product, watched, 200)
+    print(f"  one version per product: {torn:,} of {walks:,} lock-free walks saw a half-applied batch")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+# Benchmark: GET /requests serialization with stdlib json, the fast provider, and cached fragments
+# Run from the repo root: python benchmarks/json_serialization.py [restock_requests] [open_requests] [polls]
+
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as store
+import jsonprovider
+
+
+def seed_requests(n, open_requests):
+    # Steady state: older requests are closed (rejected or dispatched), the newest are still open
+    for i in range(n):
+        closed = i < n - open_requests
+        r = store.state.add_request('Milk' if i % 2 else 'Bread', 5 + i % 7, 1767225600.0)
+        store.state.set_status(r, ('Approved', 'Rejected')[i % 2] if closed else ('Pending', 'Approved')[i % 2])
+        r.comment = ' | Sent to supplier.' if i % 2 == 0 else ''
+        if closed and r.status == 'Approved':
+            store.state.set_dispatched(r, 1767225900.0)
+        store.touch_request(r)
+
+
+def timed(fn, polls):
+    start = time.perf_counter()
+    for _ in range(polls):
+        size = len(fn())
+    return size, (time.perf_counter() - start) / polls
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    open_requests = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    polls = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+    seed_requests(n, open_requests)
+    closed = sum(1 for r in store.restock_requests if store.request_fragments.is_final(r))
+    provider = store.app.json
+
+    print(f"Serializing {n} restock requests ({closed} closed), orjson {'on' if jsonprovider.orjson else 'off'}")
+    cases = (
+        ('stdlib json', lambda: json.dumps(store.restock_requests, default=provider.default, separators=(',', ':'), sort_keys=True).encode()),
+        ('provider', lambda: provider.dumps_bytes(store.restock_requests)),
+        ('provider + fragments', lambda: provider.dumps_bytes(store.request_fragments.array(store.restock_requests))),
+    )
+    for label, fn in cases:
+        size, seconds = timed(fn, polls)
+        print(f"{label:>22}: {size:>10,} bytes {seconds * 1000:8.2f} ms/poll")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+# Benchmark: GET /low-stock ranking from the indexed ratio heap vs a scan of every product,
+# under a continuous stream of sales
+# Run from the repo root: python benchmarks/low_stock.py [products] [rounds] [sales_per_round]
+
+import heapq
+import os
+import random
+import sys
+import time
+from dataclasses import replace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from catalog import CatalogIndex, stock_ratio
+from records import Product, SensorReading
+
+LIMIT = 50
+
+
+def make_products(n, rng):
+    products = {}
+    for i in range(n):
+        name = f'SKU-{i:06d}'
+        threshold = rng.randint(5, 50)
+        products[name] = Product(name, rng.randint(threshold, 500), threshold, (2, 8), (30, 90),
+                                 {'shelf': SensorReading(5.0, 50)})
+    return products
+
+
+def scan(products, limit, max_ratio=1.0):
+    # The previous approach: compare every product's stock to its threshold, then rank
+    low = ((stock_ratio(p), p.name) for p in products.values() if stock_ratio(p) <= max_ratio)
+    return [(name, ratio) for ratio, name in heapq.nsmallest(limit, low)]
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    sales = int(sys.argv[3]) if len(sys.argv) > 3 else 2000
+    rng = random.Random(11)
+    products = make_products(n, rng)
+    names = list(products)
+
+    start = time.perf_counter()
+    catalog = CatalogIndex(products.values())
+    print(f"{n:,} products, index built in {(time.perf_counter() - start) * 1000:.0f} ms; "
+          f"{rounds} rounds of {sales:,} sales then a top-{LIMIT} query")
+
+    update_time = query_time = scan_time = 0.0
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for name in rng.choices(names, k=sales):
+            p = products[name]
+            # Sell down; restocked to a healthy level once empty
+            p = products[name] = replace(p, stock=p.stock - rng.randint(1, 20) if p.stock > 20
+                                         else rng.randint(p.threshold, 500))
+            catalog.update(p)
+        update_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        result = catalog.low_stock(LIMIT)
+        query_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        expected = scan(products, LIMIT)
+        scan_time += time.perf_counter() - start
+        assert result == expected
+
+    low = len(catalog.low_stock(n))
+    print(f"  sale + index update: {update_time / (rounds * sales) * 1e6:6.2f} us")
+    print(f"  /low-stock from heap: {query_time / rounds * 1e6:8.1f} us")
+    print(f"  /low-stock by scan:   {scan_time / rounds * 1e6:8.1f} us ({scan_time / query_time:,.0f}x); "
+          f"{low:,} products at or below threshold at the end")
+
+
+if __name__ == '__main__':
+    main()
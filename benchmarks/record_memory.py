@@ -0,0 +1,63 @@
+# Benchmark: heap bytes per restock request, dict records vs slotted RestockRequest
+# Run from the repo root: python benchmarks/record_memory.py [requests]
+
+import gc
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from records import RestockRequest
+
+BASE_TS = 1767225600.0
+PRODUCTS = ['Milk', 'Bread', 'Eggs', 'Butter']
+
+
+def as_dict(i):
+    # The previous representation: ISO strings and a fresh dict per request
+    ts = BASE_TS + i
+    r = {
+        'id': i,
+        'product': PRODUCTS[i % 4],
+        'quantity': 5 + i % 7,
+        'status': 'Approved',
+        'timestamp': datetime.fromtimestamp(ts).isoformat(),
+        'comment': ' | Sent to supplier.',
+        'decision_time': datetime.fromtimestamp(ts + 30).isoformat(),
+        'supplier_id': f'{i:08x}',
+    }
+    r['dispatched_at'] = datetime.fromtimestamp(ts + 300).isoformat()
+    return r
+
+
+def as_record(i):
+    ts = BASE_TS + i
+    return RestockRequest(i, PRODUCTS[i % 4], 5 + i % 7, ts, 'Approved', ' | Sent to supplier.',
+                          ts + 30, f'{i:08x}', ts + 300)
+
+
+def measure(build, n):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    records = [build(i) for i in range(n)]
+    seconds = time.perf_counter() - start
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del records
+    return size, seconds
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    print(f"{n:,} approved + dispatched restock requests")
+    for label, build in (('dict + ISO strings', as_dict), ('RestockRequest', as_record)):
+        size, seconds = measure(build, n)
+        print(f"{label:>20}: {size / n:6.0f} bytes/request {size / 1e6:8.1f} MB total ({seconds:.2f}s to build)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+# Benchmark: columnar sensor archive write rate, rollup queries from the tiers vs re-bucketing the
+# raw rows, and RSS
+# Run from the repo root: python benchmarks/sensor_archive.py [days] [interval_seconds]
+
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from archive import ColumnSeries, SensorArchive
+
+
+def rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def best_of(n, fn, *args):
+    times = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        fn(*args)
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+
+def main():
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else 90
+    interval = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    root = tempfile.mkdtemp(prefix='sensor_archive_')
+    try:
+        archive = SensorArchive(root, flush_seconds=float('inf'))
+        rows = days * 86400 // interval
+        start_ts = time.time() - days * 86400
+        rng = np.random.default_rng(1)
+        temps = rng.uniform(0, 10, rows).round(1).tolist()
+        hums = rng.integers(40, 90, rows).tolist()
+        print(f"RSS before writes: {rss_mb():.1f} MB")
+
+        t0 = time.perf_counter()
+        for i in range(rows):
+            archive.append('Milk', 'shelf', start_ts + i * interval, temps[i], hums[i])
+        archive.flush()
+        elapsed = time.perf_counter() - t0
+        print(f"wrote {rows:,} rows ({days} days @ {interval}s) in {elapsed:.2f}s, {rows / elapsed:,.0f} rows/s")
+
+        series = archive.get('Milk', 'shelf')
+        for label, span, step in (('1 day @ 1m', 86400, 60), ('30 days @ 15m', 30 * 86400, 900),
+                                  (f'{days} days @ 1h', days * 86400, 3600)):
+            points = series.rollup(start_ts, start_ts + span, step)
+            tiered = best_of(3, series.rollup, start_ts, start_ts + span, step)
+            raw = best_of(3, lambda: ColumnSeries.buckets(*series.capture(start_ts, start_ts + span),
+                                                          start_ts, start_ts + span, step))
+            print(f"rollup {label}: {len(points)} buckets in {tiered * 1000:.1f} ms from the tier, "
+                  f"{raw * 1000:.1f} ms from raw rows")
+        print(f"peak RSS: {rss_mb():.1f} MB (on-disk size {rows * 16 / 1e6:.1f} MB)")
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+# Benchmark: batched POST /sensor-readings throughput on a single core
+# Run from the repo root: python benchmarks/sensor_ingestion.py [batch_size] [batches]
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as store
+
+
+def make_batch(n, start_ts):
+    names = list(store.products)
+    return [{
+        'product': random.choice(names),
+        'location': random.choice(['shelf', 'inventory']),
+        'ts': start_ts + i * 0.001,
+        'temp': round(random.uniform(0, 30), 1),
+        'humidity': random.randint(20, 95),
+    } for i in range(n)]
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    client = store.create_app().test_client()
+    batches = [make_batch(size, time.time() + i * size) for i in range(rounds)]
+
+    start = time.perf_counter()
+    for batch in batches:
+        res = client.post('/sensor-readings', json={'readings': batch})
+        assert res.status_code == 200 and res.json['accepted'] == size
+    elapsed = time.perf_counter() - start
+
+    print(f"{rounds} batches x {size} readings in {elapsed:.2f}s")
+    print(f"{size * rounds / elapsed:,.0f} readings/s (including JSON decode)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+# Benchmark: vectorized sensor simulation throughput, then the app's whole sensor tick: how long
+# it holds the catalog lock, and fanning the held ticks out to the archive (its own thread in the app)
+# while sensor ticks keep arriving
+# Run from the repo root: python benchmarks/sensor_simulation.py [products] [locations]
+
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as store
+from records import Product, SensorReading
+from simulation import SensorSimulator
+
+
+def make_products(n):
+    return {f'P{i}': Product(f'P{i}', 10, 5, (2 + i % 20, 8 + i % 20), (30, 90), {}) for i in range(n)}
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    m = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+    locations = {f'loc{j}': float(j) for j in range(m)}
+    sim = SensorSimulator(make_products(n), locations=locations, seed=42)
+
+    sim.tick()
+    rounds = 50
+    start = time.perf_counter()
+    for _ in range(rounds):
+        sim.tick()
+    per_tick = (time.perf_counter() - start) / rounds
+
+    print(f"{n} products x {m} locations = {n * m} readings/tick")
+    print(f"{per_tick * 1000:.2f} ms/tick, {n * m / per_tick:,.0f} readings/s")
+
+    a = SensorSimulator(make_products(10), seed=7).tick()
+    b = SensorSimulator(make_products(10), seed=7).tick()
+    print("seeded reproducibility:", all((x == y).all() for x, y in zip(a, b)))
+
+    store.create_app({'SENSOR_ARCHIVE_DIR': tempfile.mkdtemp()})
+    store.load_catalog([Product(f'P{i}', 10, 5, (2, 8), (30, 90),
+                                {'shelf': SensorReading(5.0, 50), 'inventory': SensorReading(5.0, 50)})
+                        for i in range(n)])
+    held = []
+    lock = store.state.catalog_lock
+
+    class TimedLock:
+        def __enter__(self):
+            lock.acquire()
+            self.start = time.perf_counter()
+
+        def __exit__(self, *exc):
+            held.append(time.perf_counter() - self.start)
+            lock.release()
+
+    store.state.catalog_lock = TimedLock()
+    ticks = []
+    for _ in range(6):
+        start = time.perf_counter()
+        store.sensor_tick()
+        ticks.append(time.perf_counter() - start)
+    store.state.catalog_lock = lock
+    start = time.perf_counter()
+    flusher = threading.Thread(target=store.sensor_archive.flush_ticks)
+    flusher.start()
+    during = []
+    while flusher.is_alive():
+        tick_start = time.perf_counter()
+        store.sensor_tick()
+        during.append(time.perf_counter() - tick_start)
+    flush_s = time.perf_counter() - start
+    print(f"app sensor tick, {len(store.products):,} products: {min(ticks) * 1000:.0f} ms "
+          f"({min(held) * 1000:.0f} ms holding the catalog lock)")
+    print(f"  archive fan-out of {len(ticks)} held ticks: {flush_s:.2f}s; {len(during)} ticks meanwhile, "
+          f"slowest {max(during) * 1000:.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
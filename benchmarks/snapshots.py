@@ -0,0 +1,94 @@
+# Benchmark: publishing product writes as immutable snapshots
+# A single-product write copies one chunk of the snapshot; copying the whole name -> Product dict
+# on every write is shown for comparison, as is a sensor tick publishing every product at once.
+# A writer thread moves stock between products, keeping the total fixed, while a reader sums the
+# stock without a lock: from one snapshot per walk, and looking each product up live.
+# Run from the repo root: python benchmarks/snapshots.py [products] [writes]
+
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import replace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as store
+from records import Product, SensorReading
+
+
+def make_products(n, rng):
+    return [Product(f'SKU-{i:06d}', 100, rng.randint(5, 50), (2, 8), (30, 90),
+                    {'shelf': SensorReading(5.0, 50), 'inventory': SensorReading(5.0, 50)})
+            for i in range(n)]
+
+
+def torn_sums(names, total, snapshot_reads, seconds=2.0):
+    done = threading.Event()
+    sums = torn = 0
+
+    def writer():
+        rng = random.Random(3)
+        while not done.is_set():
+            a, b = rng.sample(names, 2)
+            with store.state.locks((a, b)):
+                store.state.update({a: {'stock': store.products[a].stock - 1},
+                                    b: {'stock': store.products[b].stock + 1}})
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        if snapshot_reads:
+            snapshot = store.products.current
+            seen = sum(snapshot[name].stock for name in names)
+        else:
+            seen = sum(store.products[name].stock for name in names)
+        torn += seen != total
+        sums += 1
+    done.set()
+    thread.join()
+    return torn, sums
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    writes = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+    rng = random.Random(9)
+    store.create_app({'SENSOR_ARCHIVE_DIR': tempfile.mkdtemp()})
+    store.load_catalog(make_products(n, rng))
+    names = list(store.products)
+    print(f"{len(names):,} products")
+
+    picks = rng.choices(names, k=writes)
+    start = time.perf_counter()
+    for name in picks:
+        store.state.update({name: {'stock': rng.randint(0, 500)}})
+    snapshot_us = (time.perf_counter() - start) / writes * 1e6
+
+    table = store.products.current.to_json()
+    copies = max(1, writes // 100)
+    start = time.perf_counter()
+    for name in picks[:copies]:
+        table = {**table, name: replace(table[name], stock=rng.randint(0, 500))}
+    copy_us = (time.perf_counter() - start) / copies * 1e6
+    print(f"  one-product write, chunked snapshot: {snapshot_us:8.1f} us")
+    print(f"  one-product write, whole-dict copy:  {copy_us:8.1f} us ({copy_us / snapshot_us:,.0f}x)")
+
+    temps, humidity = store.simulator.tick()
+    start = time.perf_counter()
+    store.state.update_sensors(store.simulator.readings(temps, humidity))
+    print(f"  sensor tick, every product published as one version: {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    watched = names[:500]
+    total = sum(store.products[name].stock for name in watched)
+    torn, sums = torn_sums(watched, total, snapshot_reads=True)
+    print(f"  lock-free stock sums from one snapshot: {torn:,} of {sums:,} torn")
+    torn, sums = torn_sums(watched, total, snapshot_reads=False)
+    print(f"  lock-free stock sums, live lookups:     {torn:,} of {sums:,} torn")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+# Benchmark: cold-start latency of both services, each phase timed in a fresh interpreter
+# import (module only), create_app() (engines built), then the first requests through the test
+# client. /analytics is the first call to the supplier (unreachable here), so it pays for requests.
+# Run from the repo root: python benchmarks/startup.py [runs]
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = '''
+import json, sys, time
+t0 = time.perf_counter()
+import {module} as service
+t1 = time.perf_counter()
+client = service.create_app().test_client()
+t2 = time.perf_counter()
+times = {{'import': t1 - t0, 'create_app': t2 - t1}}
+for path in {paths!r}:
+    start = time.perf_counter()
+    assert client.get(path).status_code == 200, path
+    times[f'first {{path}}'] = time.perf_counter() - start
+times['loaded'] = sorted(m for m in ('numpy', 'requests') if m in sys.modules)
+print(json.dumps(times))
+'''
+
+SERVICES = (
+    ('store', 'app', ['/stock', '/sensor-history?product=Milk', '/analytics']),
+    ('supplier', 'supplier', ['/inventory', '/request-events']),
+)
+
+
+def probe(module, paths, env):
+    out = subprocess.run([sys.executable, '-c', PROBE.format(module=module, paths=paths)],
+                         cwd=ROOT, env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    env = {**os.environ, 'SENSOR_ARCHIVE_DIR': tempfile.mkdtemp(), 'SUPPLIER_URL': 'http://127.0.0.1:9'}
+    print(f"median of {runs} cold starts")
+    for label, module, paths in SERVICES:
+        results = [probe(module, paths, env) for _ in range(runs)]
+        print(f"{label}:")
+        for phase in results[0]:
+            if phase == 'loaded':
+                continue
+            print(f"  {phase:>34}: {statistics.median(r[phase] for r in results) * 1000:7.1f} ms")
+        print(f"  {'heavy modules loaded by the end':>34}: {', '.join(results[0]['loaded']) or '-'}")
+
+
+if __name__ == '__main__':
+    main()
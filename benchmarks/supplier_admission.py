@@ -0,0 +1,97 @@
+# Benchmark: supplier admission control under one misbehaving store
+# One store posts /new-request as fast as it can while the others post a few times a second each;
+# counts admitted and refused (429) orders per kind of store, and the per-call cost of the
+# token-bucket check with many stores.
+# Run from the repo root: python benchmarks/supplier_admission.py [stores] [seconds]
+
+import os
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import supplier
+from ratelimit import RateLimiter
+
+GOOD_RATE = 5
+NOISY = ('10.0.0.1', 'Noisy Store')
+
+
+def post_order(client, store, address='10.0.0.1'):
+    # Stores are told apart by X-Store-Id and client address; the name in the body is only contact
+    # details
+    return client.post('/new-request', headers={'X-Store-Id': store}, environ_base={'REMOTE_ADDR': address},
+                       json={'product': 'Milk', 'quantity': 1, 'store': {'name': store, 'phone': '', 'address': ''}})
+
+
+def main():
+    stores = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 3.0
+
+    limiter = RateLimiter(20, 40)
+    names = [f'store-{i}' for i in range(1000)]
+    calls = 200000
+    start = time.perf_counter()
+    for i in range(calls):
+        limiter.acquire(names[i % 1000])
+    print(f"token bucket check, 1,000 stores: {(time.perf_counter() - start) / calls * 1e6:.2f} us/call")
+
+    app = supplier.create_app({'STORE_RATE_PER_SECOND': 20, 'STORE_RATE_BURST': 40, 'MAX_OPEN_ORDERS_PER_STORE': 50})
+    client = app.test_client()
+    good = [f'Store #{i}' for i in range(stores)]
+    results = {'noisy': Counter(), 'good': Counter()}
+    retry_after = set()
+    next_good = time.monotonic()
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        response = post_order(client, 'Noisy Store')
+        results['noisy'][response.status_code] += 1
+        if response.status_code == 429:
+            retry_after.add(response.headers.get('Retry-After'))
+        if time.monotonic() >= next_good:
+            next_good += 1 / GOOD_RATE
+            for i, name in enumerate(good):
+                results['good'][post_order(client, name, f'10.0.1.{i}').status_code] += 1
+
+    print(f"{seconds:.0f}s, 1 store flooding, {stores} stores at {GOOD_RATE}/s; 20/s per store, burst 40, "
+          f"50 open orders per store")
+    for kind, counts in results.items():
+        total = sum(counts.values())
+        print(f"  {kind:>5}: {total:7,} posted  {counts[200]:6,} admitted  {counts[429]:7,} refused (429)")
+    print(f"  open orders held by the flooding store: {supplier.fulfilment.open_by_key[NOISY]}; "
+          f"Retry-After values seen: {sorted(retry_after, key=str)}")
+
+    # None of the flooding store's orders is approved, so the cap's 429 promises no time (the
+    # sleeps let its rate-limit bucket refill, so these calls reach the cap)
+    time.sleep(0.1)
+    response = post_order(client, 'Noisy Store')
+    print(f"  at the cap with every order pending: {response.status_code}, "
+          f"Retry-After {response.headers.get('Retry-After')}")
+    for req in supplier.supplier_requests:
+        if req.client == NOISY:
+            supplier.fulfilment.decide(req.id, 'approve')
+            break
+    time.sleep(0.1)
+    response = post_order(client, 'Noisy Store')
+    print(f"  with one approved: {response.status_code}, Retry-After {response.headers.get('Retry-After')}")
+
+    # Made-up store ids cannot push out a store that is still using its bucket
+    limiter = RateLimiter(20, 40, max_clients=100)
+    for _ in range(40):
+        limiter.acquire('real store')
+    admitted = sum(1 for i in range(10000) if limiter.acquire(f'fake-{i}') == 0)
+    print(f"  10,000 made-up store ids vs a 100-bucket table: {admitted} admitted, "
+          f"real store's bucket kept: {'real store' in limiter.buckets}")
+
+    # A client sending a new X-Store-Id on each call still gets one address's worth of both limits
+    codes = Counter(post_order(client, f'rotating-{i}', '10.0.2.1').status_code for i in range(2000))
+    time.sleep(1)
+    codes.update(post_order(client, f'rotating-{i}', '10.0.2.1').status_code for i in range(2000, 4000))
+    print(f"  4,000 calls from one address, each with a new store id, 1s apart in two rounds: "
+          f"{codes[200]} admitted, {codes[429]} refused; open orders held by the address: "
+          f"{supplier.fulfilment.open_by_key['10.0.2.1']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+# Benchmark: startup time and GET /stock throughput, werkzeug dev server vs serve.py (gunicorn)
+# Startup is the time from spawning the server to its first 200; throughput comes from concurrent
+# keep-alive clients. The restart row times a recycled gunicorn worker (SIGHUP) back to serving.
+# Run from the repo root: python benchmarks/wsgi_server.py [seconds]
+# Needs gunicorn, and httpx for the HTTP client shared with async_store.py.
+
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+from async_store import get
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PORT = 5000
+CONCURRENCY = (10, 100)
+REQUEST_TIMEOUT = 30
+
+
+def wait_ready(process, deadline=60):
+    start = time.perf_counter()
+    while time.perf_counter() - start < deadline:
+        if process.poll() is not None:
+            raise RuntimeError('server exited during startup')
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{PORT}/stock', timeout=1) as response:
+                if response.status == 200:
+                    return time.perf_counter() - start
+        except OSError:
+            time.sleep(0.02)
+    raise RuntimeError('server did not start')
+
+
+async def load(concurrency, seconds):
+    request = b'GET /stock HTTP/1.1\r\nHost: 127.0.0.1\r\n\r\n'
+    served = errors = 0
+    deadline = time.perf_counter() + seconds
+
+    async def worker():
+        nonlocal served, errors
+        reader = writer = None
+        while time.perf_counter() < deadline:
+            try:
+                if writer is None:
+                    reader, writer = await asyncio.open_connection('127.0.0.1', PORT)
+                status, keep_alive = await asyncio.wait_for(get(reader, writer, request), REQUEST_TIMEOUT)
+                served += status == 200
+                errors += status != 200
+            except (OSError, ValueError, IndexError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+                errors += 1
+                keep_alive = False
+            if not keep_alive and writer is not None:
+                writer.close()
+                writer = None
+        if writer is not None:
+            writer.close()
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return served / seconds, errors
+
+
+def restart_time(process):
+    # SIGHUP makes the gunicorn master replace its workers gracefully; time until a new one answers
+    pids = set(worker_pids(process.pid))
+    start = time.perf_counter()
+    process.send_signal(signal.SIGHUP)
+    while set(worker_pids(process.pid)) & pids or not worker_pids(process.pid):
+        time.sleep(0.005)
+    wait_ready(process)
+    return time.perf_counter() - start
+
+
+def worker_pids(parent):
+    out = subprocess.run(['ps', '-o', 'pid=', '--ppid', str(parent)], capture_output=True, text=True).stdout
+    return [int(pid) for pid in out.split()]
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+    env = {**os.environ, 'SENSOR_ARCHIVE_DIR': tempfile.mkdtemp(), 'SUPPLIER_URL': 'http://127.0.0.1:9'}
+    servers = (
+        ('python app.py', [sys.executable, 'app.py']),
+        ('serve.py 1x16', [sys.executable, 'serve.py', 'store', '--bind', f'127.0.0.1:{PORT}']),
+    )
+    print(f"GET /stock, {seconds:.0f}s per level")
+    for label, args in servers:
+        process = subprocess.Popen(args, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                                   start_new_session=True)
+        try:
+            startup = wait_ready(process)
+            rates = []
+            for concurrency in CONCURRENCY:
+                rate, errors = asyncio.run(load(concurrency, seconds))
+                rates.append(f"c={concurrency}: {rate:6,.0f} req/s ({errors} errors)")
+            restart = f"  restart {restart_time(process) * 1000:5.0f} ms" if 'serve.py' in label else ''
+            print(f"{label:>14}: startup {startup * 1000:5.0f} ms  " + '  '.join(rates) + restart)
+        finally:
+            os.killpg(process.pid, signal.SIGTERM)
+            process.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+# Product catalog indexes
+# Search at large SKU counts without walking the catalog: names sit in one sorted array, so a
+# prefix is a bisect plus a contiguous slice; categories map to sets of names; and the products
+# at or below their threshold (LOW_RATIO, as for /low-stock) are a set kept current on every write.
+# Matching is case-insensitive. Results come back in name order.
+# Products are also ranked by stock/threshold in an indexed min-heap, so the most depleted ones
+# are read from the top of the heap and a write moves one entry in O(log n).
+
+import bisect
+import heapq
+import threading
+
+# Sorts after every character a product name can contain, closing a prefix range
+PREFIX_END = '\U0010ffff'
+# A product is low once stock/threshold is at or below this, in search and in /low-stock alike
+LOW_RATIO = 1.0
+
+
+def stock_ratio(product):
+    # Products without a threshold never run low
+    return product.stock / product.threshold if product.threshold > 0 else float('inf')
+
+
+class RatioHeap:
+    # Binary min-heap of (ratio, name) with each name's position, so an entry is re-keyed in place
+    def __init__(self, entries=()):
+        self.heap = list(entries)
+        heapq.heapify(self.heap)
+        self.pos = {name: i for i, (_, name) in enumerate(self.heap)}
+
+    def __len__(self):
+        return len(self.heap)
+
+    def set(self, name, ratio):
+        i = self.pos.get(name)
+        if i is None:
+            self.heap.append((ratio, name))
+            self._up(len(self.heap) - 1)
+            return
+        old = self.heap[i][0]
+        self.heap[i] = (ratio, name)
+        if ratio < old:
+            self._up(i)
+        elif ratio > old:
+            self._down(i)
+
+    def smallest(self, k, max_ratio=float('inf')):
+        # Best-first walk from the root: O(k log k) and the heap itself is left untouched
+        out = []
+        frontier = [(self.heap[0], 0)] if self.heap else []
+        while frontier and len(out) < k:
+            (ratio, name), i = heapq.heappop(frontier)
+            if ratio > max_ratio:
+                break
+            out.append((name, ratio))
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < len(self.heap):
+                    heapq.heappush(frontier, (self.heap[child], child))
+        return out
+
+    def _up(self, i):
+        heap, pos = self.heap, self.pos
+        entry = heap[i]
+        while i > 0:
+            parent = (i - 1) // 2
+            if heap[parent] <= entry:
+                break
+            heap[i] = heap[parent]
+            pos[heap[i][1]] = i
+            i = parent
+        heap[i] = entry
+        pos[entry[1]] = i
+
+    def _down(self, i):
+        heap, pos = self.heap, self.pos
+        entry = heap[i]
+        n = len(heap)
+        while True:
+            child = 2 * i + 1
+            if child >= n:
+                break
+            if child + 1 < n and heap[child + 1] < heap[child]:
+                child += 1
+            if entry <= heap[child]:
+                break
+            heap[i] = heap[child]
+            pos[heap[i][1]] = i
+            i = child
+        heap[i] = entry
+        pos[entry[1]] = i
+
+
+class CatalogIndex:
+    def __init__(self, products=()):
+        self.lock = threading.Lock()
+        self.rebuild(products)
+
+    def rebuild(self, products):
+        # One sort instead of an insort per product
+        products = list(products)
+        entries = sorted((p.name.casefold(), p.name) for p in products)
+        with self.lock:
+            self.keys = [key for key, _ in entries]
+            self.names = [name for _, name in entries]
+            self.categories = {}
+            self.category_of = {}
+            self.low = set()
+            self.ratios = RatioHeap((stock_ratio(p), p.name) for p in products)
+            for p in products:
+                self._update(p)
+
+    def add(self, product):
+        key = product.name.casefold()
+        with self.lock:
+            i = bisect.bisect_left(self.keys, key)
+            while i < len(self.keys) and self.keys[i] == key and self.names[i] < product.name:
+                i += 1
+            if i == len(self.names) or self.names[i] != product.name:
+                self.keys.insert(i, key)
+                self.names.insert(i, product.name)
+            self._update(product)
+
+    def update(self, product):
+        # Call after any change to a product's stock, threshold or category
+        with self.lock:
+            self._update(product)
+
+    def update_many(self, products):
+        # A batch in one critical section, so searches see all of it or none of it
+        with self.lock:
+            for product in products:
+                self._update(product)
+
+    def _update(self, product):
+        name = product.name
+        category = product.category.casefold()
+        previous = self.category_of.get(name)
+        if previous != category:
+            if previous is not None:
+                self.categories[previous].discard(name)
+            self.categories.setdefault(category, set()).add(name)
+            self.category_of[name] = category
+        ratio = stock_ratio(product)
+        if ratio <= LOW_RATIO:
+            self.low.add(name)
+        else:
+            self.low.discard(name)
+        self.ratios.set(name, ratio)
+
+    def low_stock(self, limit, max_ratio=LOW_RATIO):
+        # The `limit` lowest stock/threshold ratios up to max_ratio, as (name, ratio), lowest first
+        with self.lock:
+            return self.ratios.smallest(limit, max_ratio)
+
+    def search(self, q='', category=None, below_threshold=False, limit=50, offset=0):
+        # Returns (total matches, one page of names)
+        with self.lock:
+            filters = []
+            if category is not None:
+                filters.append(self.categories.get(category.casefold(), set()))
+            if below_threshold:
+                filters.append(self.low)
+            filters.sort(key=len)
+
+            if q:
+                q = q.casefold()
+                lo = bisect.bisect_left(self.keys, q)
+                hi = bisect.bisect_left(self.keys, q + PREFIX_END, lo)
+                if not filters or hi - lo <= len(filters[0]):
+                    names = [n for n in self.names[lo:hi] if all(n in f for f in filters)]
+                    return len(names), names[offset:offset + limit]
+                matches = [n for n in filters[0] if n.casefold().startswith(q) and all(n in f for f in filters[1:])]
+            elif filters:
+                matches = [n for n in filters[0] if all(n in f for f in filters[1:])] if len(filters) > 1 else filters[0]
+            else:
+                return len(self.names), self.names[offset:offset + limit]
+            # Only the requested page is ordered, not every match
+            page = heapq.nsmallest(offset + limit, matches, key=sort_key)
+            return len(matches), page[offset:]
+
+
+def sort_key(name):
+    return name.casefold(), name
@@ -0,0 +1,185 @@
+# Bulk catalog import/export
+# Product catalogs and supplier inventories are read as CSV or JSON Lines in one streamed pass.
+# Every row is validated before anything is applied, so a file with errors changes nothing, and
+# the caller builds its indexes once for the whole batch instead of once per product.
+#
+# Product rows: name, category, stock, threshold and the safe ranges, as
+#   CSV:   name,category,stock,threshold,safe_temp_min,safe_temp_max,safe_humidity_min,safe_humidity_max
+#   JSONL: {"name": ..., "category": ..., "stock": ..., "threshold": ..., "safe_temp": [lo, hi], "safe_humidity": [lo, hi]}
+# Inventory rows: name, quantity (CSV columns or JSONL keys).
+# Config updates (POST /config/batch): product plus any of threshold, safe_temp, safe_humidity, category.
+
+import csv
+import io
+import json
+import math
+
+from records import Product, SensorReading
+
+FORMATS = ('csv', 'jsonl')
+CSV_FIELDS = ['name', 'category', 'stock', 'threshold',
+              'safe_temp_min', 'safe_temp_max', 'safe_humidity_min', 'safe_humidity_max']
+# Errors reported back per import; the total count is always given
+MAX_ERRORS = 100
+EXPORT_BATCH = 1000
+LOCATIONS = ('shelf', 'inventory')
+
+
+def stream_format(fmt, mimetype):
+    # An explicit ?format= wins; otherwise text/csv is CSV and anything else JSON Lines
+    fmt = fmt or ('csv' if mimetype == 'text/csv' else 'jsonl')
+    if fmt not in FORMATS:
+        raise ValueError(f'Unknown format {fmt!r}')
+    return fmt
+
+
+def text_stream(binary):
+    return io.TextIOWrapper(binary, encoding='utf-8', newline='')
+
+
+def read_rows(stream, fmt, parse, loads=json.loads):
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        return collect(_readable((reader.line_num, row) for row in reader), parse)
+    return collect(_readable((line, text) for line, text in enumerate(stream, 1) if text.strip()), parse, loads)
+
+
+def _readable(rows):
+    # Passes (line, row) through until the stream itself fails (bytes that are not UTF-8, or CSV the
+    # reader rejects, e.g. a field over csv.field_size_limit()); the error then takes the place of
+    # the first unread line, so it is reported like an invalid row and reading stops there
+    line = 0
+    try:
+        for line, row in rows:
+            yield line, row
+    except (UnicodeDecodeError, csv.Error) as e:
+        yield line + 1, e
+
+
+def collect(rows, parse, loads=None):
+    # Validates every (line, row) and returns ({name: item}, errors, error count); parse(row) returns
+    # (name, item) or raises ValueError. Only the first MAX_ERRORS errors are kept, as {"line", "error"}.
+    items = {}
+    errors = []
+    error_count = 0
+    for line, row in rows:
+        try:
+            if isinstance(row, Exception):
+                raise ValueError(f'unreadable: {row}')
+            if loads is not None:
+                row = loads(row)
+            if not isinstance(row, dict):
+                raise ValueError('expected an object')
+            name, item = parse(row)
+            if name in items:
+                raise ValueError(f'duplicate name {name!r}')
+            items[name] = item
+        except (ValueError, TypeError, KeyError) as e:
+            error_count += 1
+            if len(errors) < MAX_ERRORS:
+                errors.append({'line': line, 'error': str(e) if not isinstance(e, KeyError) else f'missing {e}'})
+    return items, errors, error_count
+
+
+# ===================== FIELDS =====================
+def _name(value):
+    if not isinstance(value, str) or not value.strip():
+        raise ValueError('name must be a non-empty string')
+    value = value.strip()
+    # The sensor archive keeps one directory per product, named by the quoted name
+    if value in ('.', '..'):
+        raise ValueError(f'name {value!r} is reserved')
+    return value
+
+
+def _count(row, field):
+    value = row[field]
+    if isinstance(value, str):
+        value = int(value)
+    elif not isinstance(value, int) or isinstance(value, bool):
+        raise ValueError(f'{field} must be an integer')
+    if value < 0:
+        raise ValueError(f'{field} must be >= 0')
+    return value
+
+
+def _number(value):
+    # Whole numbers stay ints, like the built-in products' ranges (random.randint needs them)
+    if isinstance(value, bool):
+        raise ValueError('expected a number')
+    value = float(value)
+    if not math.isfinite(value):
+        raise ValueError('expected a finite number')
+    return int(value) if value.is_integer() else value
+
+
+def _range(row, field, whole=False):
+    # [lo, hi] in JSON Lines, <field>_min/<field>_max columns in CSV
+    value = row[field] if field in row else (row[f'{field}_min'], row[f'{field}_max'])
+    if not isinstance(value, (list, tuple)) or len(value) != 2:
+        raise ValueError(f'{field} must be [min, max]')
+    lo, hi = _number(value[0]), _number(value[1])
+    if whole and not (isinstance(lo, int) and isinstance(hi, int)):
+        raise ValueError(f'{field} must be whole numbers')
+    if lo > hi:
+        raise ValueError(f'{field} min is above max')
+    return lo, hi
+
+
+def parse_product(row):
+    name = _name(row['name'])
+    safe_temp = _range(row, 'safe_temp')
+    safe_humidity = _range(row, 'safe_humidity', whole=True)
+    category = row.get('category') or ''
+    if not isinstance(category, str):
+        raise ValueError('category must be a string')
+    # Readings start mid-range; the simulator or gateways replace them (whole) from the next tick,
+    # so the locations can share one
+    reading = SensorReading((safe_temp[0] + safe_temp[1]) / 2, round((safe_humidity[0] + safe_humidity[1]) / 2))
+    return name, Product(name, _count(row, 'stock'), _count(row, 'threshold'), safe_temp, safe_humidity,
+                         dict.fromkeys(LOCATIONS, reading), category=category)
+
+
+def parse_inventory(row):
+    return _name(row['name']), _count(row, 'quantity')
+
+
+def parse_config(row):
+    # The fields present in the update, validated; absent ones keep their current value
+    changes = {}
+    if 'threshold' in row:
+        changes['threshold'] = _count(row, 'threshold')
+    for field in ('safe_temp', 'safe_humidity'):
+        if field in row:
+            changes[field] = _range(row, field, whole=field == 'safe_humidity')
+    if 'category' in row:
+        if not isinstance(row['category'], str):
+            raise ValueError('category must be a string')
+        changes['category'] = row['category']
+    return _name(row['product']), changes
+
+
+# ===================== EXPORT =====================
+def catalog_row(product):
+    return {
+        'name': product.name,
+        'category': product.category,
+        'stock': product.stock,
+        'threshold': product.threshold,
+        'safe_temp': list(product.safe_temp),
+        'safe_humidity': list(product.safe_humidity),
+    }
+
+
+def csv_chunks(products, batch=EXPORT_BATCH):
+    # CSV text in chunks of `batch` rows, header first
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_FIELDS)
+    for i, p in enumerate(products, 1):
+        writer.writerow((p.name, p.category, p.stock, p.threshold, *p.safe_temp, *p.safe_humidity))
+        if i % batch == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
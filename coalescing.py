@@ -0,0 +1,59 @@
+# Restock request coalescing
+# Replenishment decisions for a product are held for a short window and merged into one
+# request with the summed quantity, so a burst of sales costs one supplier round-trip.
+
+import heapq
+import threading
+import time
+
+COALESCE_SECONDS = 1.0
+
+
+class RestockCoalescer:
+    def __init__(self, emit, window=COALESCE_SECONDS):
+        self.emit = emit
+        self.window = window
+        self.held = {}
+        self.in_flight = {}
+        self.timers = []
+        self.cond = threading.Condition()
+
+    def offer(self, product, quantity):
+        if self.window <= 0:
+            self.emit(product, quantity)
+            return
+        with self.cond:
+            if product in self.held:
+                self.held[product] += quantity
+                return
+            self.held[product] = quantity
+            heapq.heappush(self.timers, (time.monotonic() + self.window, product))
+            self.cond.notify()
+
+    def pending(self, product):
+        # Held quantity counts as pending, so later decisions in the window only add the new shortfall
+        return self.held.get(product, 0) + self.in_flight.get(product, 0)
+
+    def run(self):
+        while True:
+            with self.cond:
+                now = time.monotonic()
+                due = []
+                while self.timers and self.timers[0][0] <= now:
+                    _, product = heapq.heappop(self.timers)
+                    quantity = self.held.pop(product)
+                    self.in_flight[product] = self.in_flight.get(product, 0) + quantity
+                    due.append((product, quantity))
+                if not due:
+                    self.cond.wait(self.timers[0][0] - now if self.timers else None)
+                    continue
+            # Supplier calls happen outside the lock so sales are never blocked on them
+            for product, quantity in due:
+                try:
+                    self.emit(product, quantity)
+                except Exception as e:
+                    print(f"[Restock] Failed to emit request for {product}: {e}")
+                with self.cond:
+                    self.in_flight[product] -= quantity
+                    if not self.in_flight[product]:
+                        del self.in_flight[product]
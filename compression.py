@@ -0,0 +1,51 @@
+# Response compression for large JSON payloads
+# Brotli when the optional `brotli` package is installed and the client accepts it, gzip otherwise.
+
+import gzip
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESS_MIN_BYTES = 1024
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+
+
+def accepted_encodings(request):
+    encodings = []
+    if brotli is not None and 'br' in request.accept_encodings:
+        encodings.append('br')
+    if 'gzip' in request.accept_encodings:
+        encodings.append('gzip')
+    return encodings
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL)
+
+
+def init_compression(app, min_bytes=COMPRESS_MIN_BYTES):
+    from flask import request
+
+    @app.after_request
+    def compress_response(response):
+        if (response.status_code != 200 or response.direct_passthrough
+                or response.mimetype != 'application/json' or 'Content-Encoding' in response.headers):
+            return response
+        response.vary.add('Accept-Encoding')
+        encodings = accepted_encodings(request)
+        if not encodings or response.content_length is None or response.content_length < min_bytes:
+            return response
+
+        encoding = encodings[0]
+        response.set_data(compress(response.get_data(), encoding))
+        response.headers['Content-Encoding'] = encoding
+        # A strong ETag names one representation, so the compressed body gets its own tag
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(f'{etag}-{encoding}')
+        return response
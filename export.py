@@ -0,0 +1,48 @@
+# Streaming NDJSON exports
+# Records are filtered by time range and encoded lazily, one batch of lines per chunk, so an
+# export holds a batch in memory however much history it covers.
+
+import bisect
+import itertools
+from datetime import datetime
+
+NDJSON_BATCH = 500
+
+
+def parse_epoch(value):
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+def time_range(args):
+    # Inclusive bounds from ?from=&to= (epoch seconds or ISO timestamps); either may be omitted
+    start = parse_epoch(args['from']) if 'from' in args else float('-inf')
+    end = parse_epoch(args['to']) if 'to' in args else float('inf')
+    return start, end
+
+
+def in_range(records, start, end, ts):
+    # records are appended in time order: bisect to the first match, stop after the last
+    first = bisect.bisect_left(records, start, key=ts)
+    for record in itertools.islice(records, first, None):
+        if ts(record) > end:
+            break
+        yield record
+
+
+def ndjson(provider, records, batch=NDJSON_BATCH):
+    lines = []
+    for record in records:
+        lines.append(provider.dumps_bytes(record))
+        if len(lines) >= batch:
+            yield b'\n'.join(lines) + b'\n'
+            lines = []
+    if lines:
+        yield b'\n'.join(lines) + b'\n'
+
+
+def ndjson_response(app, records):
+    # No Content-Length, so the body goes out with chunked transfer encoding as it is generated
+    return app.response_class(ndjson(app.json, records), mimetype='application/x-ndjson')
@@ -0,0 +1,114 @@
+# Demand forecasting for restock decisions
+# Per-product sales rate as an exponentially decayed event rate plus an hour-of-day profile,
+# both updated in O(1) per sale, turned into reorder points and order quantities.
+
+import math
+import time
+from datetime import datetime
+
+RATE_HALF_LIFE = 3600          # seconds for a sale's weight in the rate to halve
+PROFILE_CAP = 10000            # hour-of-day weights are halved once their total passes this
+PROFILE_MIN = 48               # units seen before the hour-of-day profile is trusted
+DEFAULT_LEAD_TIME = 300        # seconds from order to dispatch until one has been observed
+LEAD_TIME_QUANTILE = 0.9       # plan for the slow end of observed supplier lead times
+REVIEW_SECONDS = 600           # demand an order should cover beyond the lead time
+SERVICE_Z = 1.65               # ~95% cycle service level
+
+
+class ProductDemand:
+    __slots__ = ('rate', 'last_ts', 'profile', 'profile_total')
+
+    def __init__(self):
+        self.rate = 0.0
+        self.last_ts = None
+        self.profile = [0.0] * 24
+        self.profile_total = 0.0
+
+
+class DemandForecaster:
+    def __init__(self, lead_times=None, half_life=RATE_HALF_LIFE, default_lead_time=DEFAULT_LEAD_TIME,
+                 review_seconds=REVIEW_SECONDS, service_z=SERVICE_Z):
+        self.tau = half_life / math.log(2)
+        self.lead_times = lead_times
+        self.default_lead_time = default_lead_time
+        self.review_seconds = review_seconds
+        self.service_z = service_z
+        self.products = {}
+
+    def _get(self, product):
+        demand = self.products.get(product)
+        if demand is None:
+            demand = self.products[product] = ProductDemand()
+        return demand
+
+    # ===================== UPDATES (O(1)) =====================
+    def record_sale(self, product, quantity, ts=None):
+        ts = time.time() if ts is None else ts
+        d = self._get(product)
+        d.rate = self._decayed_rate(d, ts) + quantity / self.tau
+        d.last_ts = ts
+        hour = datetime.fromtimestamp(ts).hour
+        d.profile[hour] += quantity
+        d.profile_total += quantity
+        if d.profile_total > PROFILE_CAP:
+            # Halving keeps the profile biased towards recent days (24 slots, so still constant time)
+            d.profile = [w / 2 for w in d.profile]
+            d.profile_total /= 2
+
+    def _decayed_rate(self, d, ts):
+        if d.last_ts is None:
+            return 0.0
+        return d.rate * math.exp(-max(0.0, ts - d.last_ts) / self.tau)
+
+    # ===================== FORECASTS =====================
+    def rate(self, product, ts=None):
+        d = self.products.get(product)
+        if d is None:
+            return 0.0
+        return self._decayed_rate(d, time.time() if ts is None else ts)
+
+    def lead_time(self, product):
+        observed = self.lead_times.quantile(product, LEAD_TIME_QUANTILE) if self.lead_times else None
+        return self.default_lead_time if observed is None else observed
+
+    def _seasonal_factor(self, d, start, seconds):
+        # Mean hour-of-day weight over [start, start + seconds] relative to a flat profile
+        if d.profile_total < PROFILE_MIN or seconds <= 0:
+            return 1.0
+        mean = d.profile_total / 24
+        full_days, remainder = divmod(seconds, 86400)
+        weighted = full_days * 86400.0
+        ts = start
+        while remainder > 0:
+            hour_start = ts - ts % 3600
+            span = min(remainder, hour_start + 3600 - ts)
+            weighted += span * d.profile[datetime.fromtimestamp(ts).hour] / mean
+            ts += span
+            remainder -= span
+        return weighted / seconds
+
+    def demand(self, product, seconds, ts=None):
+        d = self.products.get(product)
+        if d is None:
+            return 0.0
+        ts = time.time() if ts is None else ts
+        # The decayed rate reflects the current hour, so scale it by the window's profile relative to now
+        now_factor = self._seasonal_factor(d, ts - ts % 3600, 3600)
+        window_factor = self._seasonal_factor(d, ts, seconds)
+        return self._decayed_rate(d, ts) * seconds * window_factor / max(now_factor, 1e-9)
+
+    def reorder_point(self, product, ts=None):
+        lead_demand = self.demand(product, self.lead_time(product), ts)
+        return lead_demand + self.service_z * math.sqrt(lead_demand)
+
+    def order_quantity(self, product, position, ts=None):
+        # Order up to: reorder point plus the demand expected over one review period
+        target = self.reorder_point(product, ts) + self.demand(product, self.review_seconds, ts)
+        return max(0, math.ceil(target - position))
+
+    def summary(self, product, ts=None):
+        return {
+            'rate_per_hour': round(self.rate(product, ts) * 3600, 3),
+            'lead_time': round(self.lead_time(product), 1),
+            'reorder_point': round(self.reorder_point(product, ts), 2),
+        }
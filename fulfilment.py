@@ -0,0 +1,163 @@
+# Event-driven fulfilment state machine for supplier requests
+# Pending -> Approved -> processing started -> picking items -> packing items -> Dispatched / Failed
+# Timed stages sit on a timer heap served by one worker thread, so each wake-up only touches
+# the orders whose stage is due; finished orders leave the active working set.
+# Open orders are counted per store (the order's admission key) and per client address, so one
+# store can be held to max_open_per_store of them and one address, whatever stores it claims to
+# speak for, to max_open_per_address.
+
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+STAGE_SECONDS = 2.5
+FEED_SIZE = 10000
+
+DISPATCHED = 'Dispatched'
+FAILED = 'Failed - Out of stock'
+
+TRANSITIONS = {
+    'Pending': ('Approved', 'Rejected'),
+    'Approved': ('processing started',),
+    'processing started': ('picking items',),
+    'picking items': ('packing items',),
+    'packing items': (DISPATCHED, FAILED),
+}
+TERMINAL = {'Rejected', DISPATCHED, FAILED}
+# Timed stages an approved order goes through before it is dispatched or fails
+APPROVED_STAGES = 4
+
+
+class FulfilmentEngine:
+    def __init__(self, inventory, stage_seconds=STAGE_SECONDS, feed_size=FEED_SIZE, max_open_per_store=None,
+                 max_open_per_address=None):
+        self.inventory = inventory
+        self.stage_seconds = stage_seconds
+        self.max_open_per_store = max_open_per_store
+        self.max_open_per_address = max_open_per_address
+        self.active = {}
+        # Store or address -> orders not yet dispatched, failed or rejected, and how many of those
+        # still wait on a manual decision
+        self.open_by_key = {}
+        self.pending_by_key = {}
+        self.timers = []
+        self.feed = deque(maxlen=feed_size)
+        self.seq = 0
+        self._tiebreak = itertools.count()
+        self.cond = threading.Condition()
+
+    # ===================== COMMANDS =====================
+    def _limits(self, req):
+        return ((req.client, self.max_open_per_store), (req.address, self.max_open_per_address))
+
+    def _full(self, req):
+        # The order's store or address if it is already at its cap, else None
+        for key, cap in self._limits(req):
+            if cap is not None and self.open_by_key.get(key, 0) >= cap:
+                return key
+        return None
+
+    def submit(self, req):
+        # False, and the order is not taken, when its store or its address is already at its cap
+        with self.cond:
+            if self._full(req) is not None:
+                return False
+            for key, _ in self._limits(req):
+                self.open_by_key[key] = self.open_by_key.get(key, 0) + 1
+                self.pending_by_key[key] = self.pending_by_key.get(key, 0) + 1
+            self.active[req.id] = req
+            return True
+
+    def retry_after(self, req):
+        # For an order submit() refused: seconds until one of the open orders holding its store or
+        # address at the cap has certainly finished, or None when all of them wait on a manual
+        # decision and no time can be promised
+        with self.cond:
+            key = self._full(req)
+            if key is not None and self.open_by_key[key] > self.pending_by_key.get(key, 0):
+                return self.stage_seconds * APPROVED_STAGES
+            return None
+
+    def decide(self, req_id, action):
+        with self.cond:
+            req = self.active.get(req_id)
+            if req is None or req.status != 'Pending':
+                return False
+            self._transition(req, 'Approved' if action == 'approve' else 'Rejected')
+            return True
+
+    # ===================== STATE MACHINE =====================
+    def _transition(self, req, status):
+        if status not in TRANSITIONS.get(req.status, ()):
+            raise ValueError(f"Illegal transition {req.status} -> {status}")
+        previous = req.status
+        req.status = status
+        self.seq += 1
+        self.feed.append({'seq': self.seq, 'id': req.id, 'from': previous, 'to': status,
+                          'at': datetime.now().isoformat()})
+        keys = (req.client, req.address)
+        if previous == 'Pending':
+            for key in keys:
+                self._release(self.pending_by_key, key)
+        if status in TERMINAL:
+            self.active.pop(req.id, None)
+            for key in keys:
+                self._release(self.open_by_key, key)
+        else:
+            self._schedule(req)
+
+    @staticmethod
+    def _release(counts, key):
+        count = counts.pop(key) - 1
+        if count:
+            counts[key] = count
+
+    def _schedule(self, req):
+        if req.status != 'Pending':
+            due = time.monotonic() + self.stage_seconds
+            heapq.heappush(self.timers, (due, next(self._tiebreak), req.id))
+            self.cond.notify()
+
+    def _advance(self, req):
+        status = req.status
+        if status == 'Approved':
+            print(f"[START] Processing request {req.id}")
+            self._transition(req, 'processing started')
+        elif status == 'processing started':
+            print(f"[Picking] {req.quantity} x {req.product}")
+            self._transition(req, 'picking items')
+        elif status == 'picking items':
+            print(f"[Packing] {req.quantity} x {req.product}")
+            self._transition(req, 'packing items')
+        elif status == 'packing items':
+            if self.inventory[req.product] >= req.quantity:
+                self.inventory[req.product] -= req.quantity
+                req.dispatched_at = time.time()
+                self._transition(req, DISPATCHED)
+                print(f"[Dispatched] {req.product} to {req.store['name']}")
+            else:
+                self._transition(req, FAILED)
+                print(f"[FAILED] Not enough stock for {req.id}")
+
+    def run(self):
+        with self.cond:
+            while True:
+                now = time.monotonic()
+                while self.timers and self.timers[0][0] <= now:
+                    _, _, req_id = heapq.heappop(self.timers)
+                    req = self.active.get(req_id)
+                    if req is not None:
+                        self._advance(req)
+                timeout = self.timers[0][0] - now if self.timers else None
+                self.cond.wait(timeout)
+
+    # ===================== READ =====================
+    def changes(self, since=0):
+        with self.cond:
+            oldest = self.feed[0]['seq'] if self.feed else self.seq + 1
+            skip = max(0, since + 1 - oldest)
+            return {'seq': self.seq, 'reset': since + 1 < oldest and since < self.seq,
+                    'changes': list(itertools.islice(self.feed, skip, None))}
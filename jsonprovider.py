@@ -0,0 +1,139 @@
+# Fast JSON serialization
+# Flask JSON provider that encodes with orjson when it is installed (stdlib json otherwise), and a
+# cache of pre-encoded fragments for records that can no longer change, so they are encoded once.
+
+import json
+from collections import OrderedDict
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+# orjson.Fragment (embedding pre-encoded JSON) arrived in orjson 3.9; older releases still encode,
+# and cached fragments are then joined as bytes as with the stdlib encoder
+Fragment = getattr(orjson, 'Fragment', None)
+
+
+class RawJSON:
+    # Already-encoded JSON, embedded verbatim by FastJSONProvider
+    __slots__ = ('data',)
+
+    def __init__(self, data):
+        self.data = data
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    def __init__(self, app):
+        super().__init__(app)
+        self._encoders = {}
+
+    @staticmethod
+    def default(o):
+        # Record types (records.py) render their own API shape
+        to_json = getattr(o, 'to_json', None)
+        if to_json is not None:
+            return to_json()
+        return DefaultJSONProvider.default(o)
+
+    def _indent(self):
+        return self.compact is False or (self.compact is None and self._app.debug)
+
+    def dumps_bytes(self, obj, indent=False):
+        if orjson is not None:
+            # Dataclasses are passed to default() so records render through their to_json()
+            option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_PASSTHROUGH_DATACLASS
+            if self.sort_keys:
+                option |= orjson.OPT_SORT_KEYS
+            if indent:
+                option |= orjson.OPT_INDENT_2
+            return orjson.dumps(obj, default=self._orjson_default, option=option)
+
+        # stdlib cannot embed raw bytes, so fragments are only supported as the whole
+        # payload or as top-level values of a dict, spliced in after encoding the rest
+        if isinstance(obj, RawJSON):
+            return obj.data
+        raw = {k: v for k, v in obj.items() if isinstance(v, RawJSON)} if isinstance(obj, dict) else None
+        if raw:
+            obj = {k: v for k, v in obj.items() if k not in raw}
+        data = self._encoder(indent).encode(obj).encode()
+        if raw:
+            spliced = b','.join(json.dumps(k).encode() + b':' + v.data for k, v in raw.items())
+            data = data[:-1] + (b',' if obj else b'') + spliced + b'}'
+        return data
+
+    def _encoder(self, indent):
+        # Encoders are reused, since building one per call dominates when encoding small records
+        encoder = self._encoders.get(indent)
+        if encoder is None:
+            encoder = self._encoders[indent] = json.JSONEncoder(
+                default=self.default, ensure_ascii=self.ensure_ascii, sort_keys=self.sort_keys,
+                indent=2 if indent else None, separators=None if indent else (',', ':'))
+        return encoder
+
+    def _orjson_default(self, o):
+        if isinstance(o, RawJSON):
+            return Fragment(o.data) if Fragment is not None else orjson.loads(o.data)
+        return self.default(o)
+
+    def dumps(self, obj, **kwargs):
+        if kwargs or orjson is None:
+            return super().dumps(obj, **kwargs)
+        return self.dumps_bytes(obj).decode()
+
+    def loads(self, s, **kwargs):
+        if kwargs or orjson is None:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumps_bytes(obj, self._indent()) + b'\n', mimetype=self.mimetype)
+
+
+class FragmentCache:
+    # Encoded records, kept only once is_final(record) says the record will not change again
+    def __init__(self, provider, key, is_final, max_items=None):
+        self.provider = provider
+        self.key = key
+        self.is_final = is_final
+        self.max_items = max_items
+        self.fragments = OrderedDict()
+
+    def fragment(self, record):
+        # The cached fragment, or the record itself while it can still change
+        k = self.key(record)
+        fragment = self.fragments.get(k)
+        if fragment is not None:
+            return fragment
+        if not self.is_final(record):
+            return record
+        data = self.provider.dumps_bytes(record)
+        fragment = self.fragments[k] = Fragment(data) if Fragment is not None else data
+        if self.max_items is not None and len(self.fragments) > self.max_items:
+            self.fragments.popitem(last=False)
+        return fragment
+
+    def array(self, records):
+        if Fragment is not None:
+            # orjson writes Fragments verbatim and encodes the live records in the same call
+            return [self.fragment(r) for r in records]
+        # Live records are encoded a run at a time, then joined with the cached bytes
+        parts, run = [], []
+        for f in map(self.fragment, records):
+            if isinstance(f, bytes):
+                if run:
+                    parts.append(self.provider.dumps_bytes(run)[1:-1])
+                    run = []
+                parts.append(f)
+            else:
+                run.append(f)
+        if run:
+            parts.append(self.provider.dumps_bytes(run)[1:-1])
+        return RawJSON(b'[' + b','.join(parts) + b']')
+
+
+def init_json(app):
+    app.json = FastJSONProvider(app)
+    return app.json
@@ -0,0 +1,93 @@
+# Supplier lead-time tracking
+# Per-product order -> approve -> dispatch durations kept in log-bucketed quantile sketches
+# (DDSketch-style): relative-error quantiles in a bounded number of buckets per product,
+# regardless of how many orders have been observed.
+
+import math
+import threading
+from datetime import datetime
+
+RELATIVE_ACCURACY = 0.02
+MAX_BUCKETS = 256
+STAGES = ('approve', 'dispatch', 'total')
+
+
+class QuantileSketch:
+    __slots__ = ('gamma_log', 'max_buckets', 'buckets', 'zeros', 'count', 'min', 'max')
+
+    def __init__(self, relative_accuracy=RELATIVE_ACCURACY, max_buckets=MAX_BUCKETS):
+        gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.gamma_log = math.log(gamma)
+        self.max_buckets = max_buckets
+        self.buckets = {}
+        self.zeros = 0
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value):
+        self.count += 1
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        if value <= 0:
+            self.zeros += 1
+            return
+        key = math.ceil(math.log(value) / self.gamma_log)
+        self.buckets[key] = self.buckets.get(key, 0) + 1
+        if len(self.buckets) > self.max_buckets:
+            # Collapse the two lowest buckets: accuracy is kept for the upper quantiles that matter
+            low, second = sorted(self.buckets)[:2]
+            self.buckets[second] += self.buckets.pop(low)
+
+    def quantile(self, q):
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        if rank < self.zeros:
+            return 0.0
+        seen = self.zeros
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if seen > rank:
+                # Bucket midpoint in log space keeps the estimate within the relative accuracy
+                value = 2 * math.exp(key * self.gamma_log) / (1 + math.exp(self.gamma_log))
+                return min(max(value, self.min), self.max)
+        return self.max
+
+
+class LeadTimeTracker:
+    def __init__(self, relative_accuracy=RELATIVE_ACCURACY, max_buckets=MAX_BUCKETS):
+        self.relative_accuracy = relative_accuracy
+        self.max_buckets = max_buckets
+        self.products = {}
+        self.lock = threading.Lock()
+
+    def record(self, product, ordered_at, approved_at, dispatched_at):
+        ordered, approved, dispatched = (_epoch(t) for t in (ordered_at, approved_at, dispatched_at))
+        with self.lock:
+            sketches = self.products.get(product)
+            if sketches is None:
+                sketches = self.products[product] = {
+                    stage: QuantileSketch(self.relative_accuracy, self.max_buckets) for stage in STAGES}
+            sketches['approve'].add(approved - ordered)
+            sketches['dispatch'].add(dispatched - approved)
+            sketches['total'].add(dispatched - ordered)
+
+    def quantile(self, product, q, stage='total'):
+        with self.lock:
+            sketches = self.products.get(product)
+            return sketches[stage].quantile(q) if sketches else None
+
+    def summary(self, product):
+        with self.lock:
+            sketches = self.products.get(product)
+            if not sketches:
+                return {'count': 0}
+            out = {'count': sketches['total'].count}
+            for stage, sketch in sketches.items():
+                out[stage] = {name: round(sketch.quantile(q), 2) for name, q in (('p50', 0.5), ('p90', 0.9), ('p99', 0.99))}
+            return out
+
+
+def _epoch(t):
+    return datetime.fromisoformat(t).timestamp() if isinstance(t, str) else t
@@ -0,0 +1,46 @@
+# Per-client token-bucket rate limiting
+# Each client (a store) has a bucket of `burst` tokens refilled at `rate` tokens per second; a call
+# takes one token or is refused with the time until the next one is due. Buckets are refilled
+# lazily when their client calls, so a call is O(1) however many clients there are. At
+# max_clients the least recently seen bucket is dropped once it has refilled (a full bucket is the
+# same as a new one); until then new clients wait, so a flood of made-up client ids can never reset
+# the bucket of a store that is still using it.
+
+import threading
+import time
+from collections import OrderedDict
+
+MAX_CLIENTS = 10000
+
+
+class RateLimiter:
+    def __init__(self, rate, burst, max_clients=MAX_CLIENTS, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self.clock = clock
+        # client -> [tokens, time of last refill], least recently seen first
+        self.buckets = OrderedDict()
+        self.lock = threading.Lock()
+
+    def acquire(self, client):
+        # 0 when the call is admitted, otherwise the seconds until the client has a token again
+        now = self.clock()
+        with self.lock:
+            bucket = self.buckets.get(client)
+            if bucket is None:
+                if len(self.buckets) >= self.max_clients:
+                    tokens, last = next(iter(self.buckets.values()))
+                    refilled_in = (self.burst - tokens) / self.rate - (now - last)
+                    if refilled_in > 0:
+                        return refilled_in
+                    self.buckets.popitem(last=False)
+                bucket = self.buckets[client] = [self.burst, now]
+            else:
+                self.buckets.move_to_end(client)
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return 0
+            return (1 - bucket[0]) / self.rate
@@ -0,0 +1,123 @@
+# Compact record types
+# Slotted dataclasses for products, sensor readings, restock requests and supplier orders.
+# Products are frozen: writers publish changed copies (dataclasses.replace) through state.py, and
+# their sensors dicts are replaced, never updated in place.
+# Timestamps are epoch seconds and product names are interned; to_json() renders each record
+# in the API's JSON shape (ISO timestamps, optional request fields only once they are set).
+
+import sys
+from dataclasses import dataclass
+from datetime import datetime
+
+
+def iso(ts):
+    return datetime.fromtimestamp(ts).isoformat()
+
+
+@dataclass(slots=True)
+class SensorReading:
+    temp: float
+    humidity: float
+
+    def to_json(self):
+        return {'temp': self.temp, 'humidity': self.humidity}
+
+
+@dataclass(slots=True, frozen=True)
+class Product:
+    name: str
+    stock: int
+    threshold: int
+    safe_temp: tuple
+    safe_humidity: tuple
+    sensors: dict
+    sales: int = 0
+    category: str = ''
+
+    def __post_init__(self):
+        object.__setattr__(self, 'name', sys.intern(self.name))
+        object.__setattr__(self, 'category', sys.intern(self.category))
+
+    def with_sensors(self, sensors):
+        # dataclasses.replace(self, sensors=...) without its per-call field lookup: every sensor
+        # tick copies every product
+        return Product(self.name, self.stock, self.threshold, self.safe_temp, self.safe_humidity, sensors,
+                       self.sales, self.category)
+
+    def to_json(self):
+        return {
+            'stock': self.stock,
+            'threshold': self.threshold,
+            'sales': self.sales,
+            'category': self.category,
+            'safe_temp': self.safe_temp,
+            'safe_humidity': self.safe_humidity,
+            'sensors': {loc: r.to_json() for loc, r in self.sensors.items()},
+        }
+
+
+@dataclass(slots=True)
+class RestockRequest:
+    id: int
+    product: str
+    quantity: int
+    timestamp: float
+    status: str = 'Pending'
+    comment: str = ''
+    decision_time: float = None
+    supplier_id: str = None
+    dispatched_at: float = None
+
+    def __post_init__(self):
+        self.product = sys.intern(self.product)
+
+    @property
+    def closed(self):
+        # Rejected, failed and dispatched requests never change again
+        return self.status == 'Rejected' or self.status == 'Failed' or self.dispatched_at is not None
+
+    def to_json(self):
+        out = {
+            'id': self.id,
+            'product': self.product,
+            'quantity': self.quantity,
+            'status': self.status,
+            'timestamp': iso(self.timestamp),
+            'comment': self.comment,
+        }
+        if self.decision_time is not None:
+            out['decision_time'] = iso(self.decision_time)
+        if self.supplier_id is not None:
+            out['supplier_id'] = self.supplier_id
+        if self.dispatched_at is not None:
+            out['dispatched_at'] = iso(self.dispatched_at)
+        return out
+
+
+@dataclass(slots=True)
+class SupplierOrder:
+    id: str
+    product: str
+    quantity: int
+    store: dict
+    created_at: float
+    status: str = 'Pending'
+    dispatched_at: float = None
+    # The admission keys (supplier.store_key, and the client address) the order counts against;
+    # not part of the API shape
+    client: tuple = None
+    address: str = None
+
+    def __post_init__(self):
+        self.product = sys.intern(self.product)
+
+    def to_json(self):
+        return {
+            'id': self.id,
+            'product': self.product,
+            'quantity': self.quantity,
+            'store': self.store,
+            'status': self.status,
+            'created_at': iso(self.created_at),
+            'dispatched_at': None if self.dispatched_at is None else iso(self.dispatched_at),
+        }
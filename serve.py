@@ -0,0 +1,108 @@
+# Production launcher for the store (app.py) and supplier (supplier.py) services
+# Serves the Flask app with gunicorn's threaded workers instead of the werkzeug dev server. The app
+# is imported once in the gunicorn master (preload) and forked into workers, so a new or recycled
+# worker is serving in milliseconds instead of re-importing NumPy and reopening the archive.
+#
+# Background threads (sensor ticks, supplier event sync, restock coalescer, fulfilment) are not
+# started at import, so the master forks without them. A worker waits on an flock on one lock file
+# per launch and starts them once it holds it, so while a replacement worker starts (SIGHUP, or
+# after a crash) they never run twice; the kernel drops the lock when the old worker exits.
+#
+# Stock, requests and orders live in process memory, so a second worker would serve its own copy
+# and a recycled one would come back with the preloaded state: the launcher runs exactly one worker
+# with a thread pool, and refuses --workers other than 1 and --max-requests other than 0.
+#
+# Run: python serve.py store    [--bind 127.0.0.1:5000] [--threads 16]
+#      python serve.py supplier [--bind 127.0.0.1:5001]
+# Needs gunicorn (Linux/macOS). python app.py and python supplier.py remain the development servers.
+
+import argparse
+import fcntl
+import importlib
+import os
+import tempfile
+import threading
+
+from gunicorn.app.base import BaseApplication
+
+SERVICES = {
+    'store': ('app', '127.0.0.1:5000'),
+    'supplier': ('supplier', '127.0.0.1:5001'),
+}
+
+
+class Launcher(BaseApplication):
+    def __init__(self, module_name, options, lock_path):
+        self.module_name = module_name
+        self.module = None
+        self.options = options
+        self.lock_path = lock_path
+        self.lock_file = None
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+        self.cfg.set('post_worker_init', self.claim_background)
+        self.cfg.set('on_exit', self.remove_lock)
+
+    def load(self):
+        # With preload_app this runs once in the master, before any worker is forked
+        self.module = importlib.import_module(self.module_name)
+        return self.module.create_app()
+
+    def claim_background(self, worker):
+        # The lock is held until the file is closed, i.e. for the life of the worker process
+        self.lock_file = open(self.lock_path, 'a')
+
+        def claim():
+            fcntl.flock(self.lock_file, fcntl.LOCK_EX)
+            worker.log.info('Worker %s runs the background threads', worker.pid)
+            self.module.start_background()
+
+        threading.Thread(target=claim, daemon=True).start()
+
+    def remove_lock(self, arbiter):
+        try:
+            os.remove(self.lock_path)
+        except OSError:
+            pass
+
+
+def options(args):
+    module_name, default_bind = SERVICES[args.service]
+    return module_name, {
+        'bind': args.bind or default_bind,
+        'workers': args.workers,
+        'worker_class': 'gthread',
+        'threads': args.threads,
+        'preload_app': True,
+        'max_requests': args.max_requests,
+        'max_requests_jitter': args.max_requests // 10,
+        'graceful_timeout': args.graceful_timeout,
+        'keepalive': 5,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the store or supplier service with gunicorn.')
+    parser.add_argument('service', choices=SERVICES)
+    parser.add_argument('--bind', help='host:port (default: 127.0.0.1:5000 store, 127.0.0.1:5001 supplier)')
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('WEB_WORKERS', 1)),
+                        help='must be 1 (state is per process)')
+    parser.add_argument('--threads', type=int, default=int(os.environ.get('WEB_THREADS', 16)))
+    parser.add_argument('--max-requests', type=int, default=0, help='must be 0 (recycling resets state)')
+    parser.add_argument('--graceful-timeout', type=int, default=30)
+    args = parser.parse_args()
+    if args.workers != 1:
+        parser.error(f'--workers/WEB_WORKERS is {args.workers}: state lives in process memory, so each '
+                     'worker would keep its own diverging copy; run one worker and raise --threads')
+    if args.max_requests:
+        parser.error('--max-requests would recycle the worker and reset its in-memory state; use 0')
+    module_name, opts = options(args)
+    lock_path = os.path.join(tempfile.gettempdir(), f'{args.service}-{os.getpid()}.background.lock')
+    Launcher(module_name, opts, lock_path).run()
+
+
+if __name__ == '__main__':
+    main()
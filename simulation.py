@@ -0,0 +1,103 @@
+# Vectorized sensor simulation engine
+# Generates temp/humidity readings for N products x M locations per tick in one pass.
+
+import numpy as np
+
+from records import SensorReading
+
+# Location name -> temperature offset applied to the product's safe range
+DEFAULT_LOCATIONS = {'shelf': 0.0, 'inventory': 2.0}
+
+
+class SensorSimulator:
+    def __init__(self, products, locations=None, seed=None, tick_seconds=10,
+                 outside_prob=0.5, temp_wiggle=(2, 2), humidity_wiggle=(5, 10)):
+        self.locations = dict(locations or DEFAULT_LOCATIONS)
+        self.tick_seconds = tick_seconds
+        self.outside_prob = outside_prob
+        self.temp_wiggle = temp_wiggle
+        self.humidity_wiggle = humidity_wiggle
+        self.rng = np.random.default_rng(seed)
+        self.load(products)
+
+    # ===================== BOUNDS =====================
+    def load(self, products):
+        self.names = list(products.keys())
+        self.index = {name: i for i, name in enumerate(self.names)}
+        n = len(self.names)
+        self.safe_temp = np.array([p.safe_temp for p in products.values()], dtype=float).reshape(n, 2)
+        self.safe_humidity = np.array([p.safe_humidity for p in products.values()], dtype=float).reshape(n, 2)
+        self._rebuild()
+
+    def update_bounds(self, product, safe_temp=None, safe_humidity=None):
+        self.update_bounds_many([(product, safe_temp, safe_humidity)])
+
+    def update_bounds_many(self, updates):
+        # (product, safe_temp, safe_humidity) triples, None keeping a bound; one rebuild for the batch
+        for product, safe_temp, safe_humidity in updates:
+            i = self.index[product]
+            if safe_temp is not None:
+                self.safe_temp[i] = safe_temp
+            if safe_humidity is not None:
+                self.safe_humidity[i] = safe_humidity
+        self._rebuild()
+
+    def _rebuild(self):
+        # Per-reading (product, location) band coefficients, precomputed so tick() is pure array math
+        offsets = np.array(list(self.locations.values()))[None, :]
+        shape = (len(self.names), len(self.locations))
+        t_lo = self.safe_temp[:, :1] + offsets
+        t_hi = self.safe_temp[:, 1:] + offsets
+        h_lo = np.broadcast_to(self.safe_humidity[:, :1], shape)
+        h_hi = np.broadcast_to(self.safe_humidity[:, 1:], shape)
+        self._temp_bands = self._bands(t_lo, t_hi, *self.temp_wiggle)
+        self._humidity_bands = self._bands(h_lo, h_hi, *self.humidity_wiggle)
+        self._u = np.empty((2,) + shape)
+
+    def _bands(self, lo, hi, lower_wiggle, upper_wiggle):
+        # A single uniform draw u picks the band and the position inside it:
+        # [0, p/2) below the range, [p/2, p) above it, [p, 1) inside it.
+        # Each band is linear in u, so a reading is intercept + u * slope, and the
+        # below/above bands are stored as deltas from the inside band.
+        p = self.outside_prob
+        half = max(p / 2, 1e-12)
+        rest = max(1 - p, 1e-12)
+        span = hi - lo
+        in_slope = span / rest
+        in_icpt = lo - p * in_slope
+        below_slope = (lower_wiggle - 0.1) / half
+        below_icpt = lo - lower_wiggle
+        above_slope = (upper_wiggle - 0.1) / half
+        above_icpt = hi + 0.1 - (upper_wiggle - 0.1)
+        return (in_icpt, in_slope,
+                below_icpt - in_icpt, below_slope - in_slope,
+                above_icpt - in_icpt, above_slope - in_slope)
+
+    # ===================== TICK =====================
+    def _maybe_outside(self, bands, u):
+        in_icpt, in_slope, d_below_icpt, d_below_slope, d_above_icpt, d_above_slope = bands
+        below = u < self.outside_prob / 2
+        above = (u < self.outside_prob) ^ below
+        icpt = below * d_below_icpt
+        icpt += above * d_above_icpt
+        icpt += in_icpt
+        slope = below * d_below_slope
+        slope += above * d_above_slope
+        slope += in_slope
+        slope *= u
+        slope += icpt
+        return np.round(slope, 1, out=slope)
+
+    def tick(self):
+        u = self.rng.random(out=self._u)
+        temps = self._maybe_outside(self._temp_bands, u[0])
+        humidity = np.trunc(self._maybe_outside(self._humidity_bands, u[1]))
+        return temps, humidity
+
+    def readings(self, temps, humidity):
+        # One tick's arrays as name -> {location: SensorReading}, for StoreState.update_sensors
+        locs = list(self.locations.keys())
+        temps = temps.tolist()
+        humidity = humidity.astype(int).tolist()
+        return {name: {loc: SensorReading(t, h) for loc, t, h in zip(locs, temps[i], humidity[i])}
+                for i, name in enumerate(self.names)}
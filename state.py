@@ -0,0 +1,228 @@
+# Shared store state and its concurrency model
+# Products are immutable: a write makes a new Product copy and publishes it in a new version of
+# the product table (a Snapshot). Readers take no lock: they grab the current snapshot, which no
+# write changes, so every product in a response comes from one version. A snapshot shares all but
+# the chunk a write touches with the previous version, so publishing one product is cheap at large
+# catalogs. Publishing is serialized by one short lock, and each write is applied to the latest
+# copy of a product, so concurrent writers of different fields (stock and sensors) never undo
+# each other.
+# Writers that read-modify-write a product or one of its restock requests also hold that product's
+# RLock, so different products never wait on each other. Request ids come from one allocator.
+# Request status and dispatch changes go through set_status()/set_dispatched(), which keep the
+# per-status counts, the open requests and each product's quantity still on order current, so
+# neither a sale nor a dashboard poll scans the requests.
+# catalog_lock serializes changes to the set of products with the sensor tick, which walks every
+# product and the simulator arrays built from them.
+
+import itertools
+import threading
+from collections.abc import Mapping
+from contextlib import ExitStack, contextmanager
+from dataclasses import replace
+
+from records import RestockRequest
+
+# Products per snapshot chunk; a write copies one chunk and the tuple of chunks
+CHUNK_BITS = 8
+CHUNK_MASK = (1 << CHUNK_BITS) - 1
+
+
+class Snapshot(Mapping):
+    # One immutable version of the product table, name -> Product in insertion order. Products sit
+    # in fixed-size chunks by slot; the name -> slot index only grows and is shared by every
+    # version, each of which ignores slots past its own size. values() and items() are iterators.
+    __slots__ = ('version', 'chunks', 'size', 'slots')
+
+    def __init__(self, version=0, chunks=(), size=0, slots=None):
+        self.version = version
+        self.chunks = chunks
+        self.size = size
+        self.slots = {} if slots is None else slots
+
+    def __getitem__(self, name):
+        slot = self.slots[name]
+        if slot >= self.size:
+            raise KeyError(name)
+        return self.chunks[slot >> CHUNK_BITS][slot & CHUNK_MASK]
+
+    def __iter__(self):
+        return (p.name for p in self.values())
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, name):
+        slot = self.slots.get(name)
+        return slot is not None and slot < self.size
+
+    def get(self, name, default=None):
+        return self[name] if name in self else default
+
+    def values(self):
+        return itertools.chain.from_iterable(self.chunks)
+
+    def items(self):
+        return ((p.name, p) for p in self.values())
+
+    def set_many(self, products):
+        # The next version with these products replacing ones of the same name or appended; only
+        # the chunks they fall in are copied
+        chunks = list(self.chunks)
+        copied = {}
+        slots = self.slots
+        size = self.size
+        for p in products:
+            slot = slots.get(p.name)
+            if slot is None or slot >= size:
+                slot = slots[p.name] = size
+                size += 1
+            i = slot >> CHUNK_BITS
+            chunk = copied.get(i)
+            if chunk is None:
+                if i == len(chunks):
+                    chunks.append(())
+                chunk = copied[i] = list(chunks[i])
+            j = slot & CHUNK_MASK
+            if j == len(chunk):
+                chunk.append(p)
+            else:
+                chunk[j] = p
+        for i, chunk in copied.items():
+            chunks[i] = tuple(chunk)
+        return Snapshot(self.version + 1, tuple(chunks), size, slots)
+
+    def to_json(self):
+        return {p.name: p for p in self.values()}
+
+
+class ProductTable(Mapping):
+    # Name -> Product, reading through to the current snapshot. A reader that looks at several
+    # products, or one product twice, takes `current` once and reads from that.
+    def __init__(self, products=None):
+        self.current = Snapshot().set_many((products or {}).values())
+
+    def __getitem__(self, name):
+        return self.current[name]
+
+    def __iter__(self):
+        return iter(self.current)
+
+    def __len__(self):
+        return len(self.current)
+
+    def __contains__(self, name):
+        return name in self.current
+
+    def get(self, name, default=None):
+        return self.current.get(name, default)
+
+    def keys(self):
+        return self.current.keys()
+
+    def items(self):
+        return self.current.items()
+
+    def values(self):
+        return self.current.values()
+
+    def publish(self, snapshot):
+        self.current = snapshot
+
+    def to_json(self):
+        return self.current.to_json()
+
+
+class StoreState:
+    def __init__(self, products, global_lock=False):
+        self.products = products
+        self.requests = []
+        self.request_index = {}
+        # global_lock makes every writer share one lock, the baseline for benchmarks/concurrency.py
+        self.global_lock = global_lock
+        self._global = threading.RLock()
+        self._locks = {name: threading.RLock() for name in products}
+        self._ids = itertools.count(1)
+        # Requests per status; the open ones (Pending, or Approved and not yet dispatched) by id;
+        # and per product the quantity of its open requests
+        self.status_counts = dict.fromkeys(('Pending', 'Approved', 'Rejected', 'Failed'), 0)
+        self.open_requests = {}
+        self.open_quantity = {}
+        self._requests_lock = threading.Lock()
+        self._publish_lock = threading.Lock()
+        self.catalog_lock = threading.RLock()
+
+    def lock(self, product):
+        return self._global if self.global_lock else self._locks[product]
+
+    @contextmanager
+    def locks(self, products):
+        # Several products' locks, always taken in name order
+        with ExitStack() as stack:
+            for name in sorted(set(products)):
+                stack.enter_context(self.lock(name))
+            yield
+
+    def add_product(self, product):
+        return self.update(added=[product])
+
+    def update(self, changes=None, added=()):
+        # Publishes one new version: changes (name -> {field: value}) applied to the latest copies
+        # of existing products, plus the `added` Products. Returns the new snapshot.
+        with self._publish_lock:
+            snapshot = self.products.current
+            for p in added:
+                self._locks.setdefault(p.name, threading.RLock())
+            copies = [replace(snapshot[name], **fields) for name, fields in changes.items()] if changes else ()
+            return self._publish(snapshot.set_many(itertools.chain(added, copies)))
+
+    def update_sensors(self, readings):
+        # name -> {location: SensorReading}, merged into the latest copies' sensors
+        with self._publish_lock:
+            snapshot = self.products.current
+            copies = []
+            for name, new in readings.items():
+                p = snapshot[name]
+                copies.append(p.with_sensors({**p.sensors, **new}))
+            return self._publish(snapshot.set_many(copies))
+
+    def _publish(self, snapshot):
+        self.products.publish(snapshot)
+        return snapshot
+
+    def add_request(self, product, quantity, ts):
+        # Ids are allocated and appended under one lock, so the list stays in id (and time) order
+        with self._requests_lock:
+            r = RestockRequest(next(self._ids), product, quantity, ts)
+            self.requests.append(r)
+            self.request_index[r.id] = r
+            self._tally(r, 1)
+        return r
+
+    def set_status(self, r, status):
+        with self._requests_lock:
+            self._tally(r, -1)
+            r.status = status
+            self._tally(r, 1)
+
+    def set_dispatched(self, r, ts):
+        with self._requests_lock:
+            self._tally(r, -1)
+            r.dispatched_at = ts
+            self._tally(r, 1)
+
+    def _tally(self, r, sign):
+        self.status_counts[r.status] = self.status_counts.get(r.status, 0) + sign
+        if r.dispatched_at is None and (r.status == 'Pending' or r.status == 'Approved'):
+            self.open_quantity[r.product] = self.open_quantity.get(r.product, 0) + sign * r.quantity
+            if sign > 0:
+                self.open_requests[r.id] = r
+            else:
+                del self.open_requests[r.id]
+
+    def open_before(self, req_id):
+        # Open requests with ids below req_id, oldest first
+        with self._requests_lock:
+            return sorted((r for i, r in self.open_requests.items() if i < req_id), key=lambda r: r.id)
+
+    def pending_quantity(self, product):
+        return self.open_quantity.get(product, 0)
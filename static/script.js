@@ -2,60 +2,178 @@ let products = {};
 let supplierStockData = {};
 let pendingSupplier = {};
 let salesChartInstance = null;
+let requestsData = [];
 
-function fetchStock() {
-  fetch('/stock')
+// Keyed rows: product/request key -> { el, fields, ... } so renders patch instead of rebuild
+const stockRows = new Map();
+const salesRows = new Map();
+const alertRows = new Map();
+const requestRows = new Map();
+
+// Request list is virtualized: rows have a fixed height and only the visible window exists in the DOM
+const REQUEST_ROW_HEIGHT = 110;
+const REQUEST_OVERSCAN = 5;
+let requestScrollPending = false;
+
+// Dashboard state is one versioned snapshot; later polls ask only for what changed since it
+let dashboardVersion = null;
+let dashboardInFlight = false;
+let dashboardQueued = false;
+const DASHBOARD_POLL_MS = 5000;
+
+function fetchDashboard() {
+  if (dashboardInFlight) {
+    dashboardQueued = true;
+    return;
+  }
+  dashboardInFlight = true;
+  // The version token names the server process too; one from before a restart gets a full payload
+  const url = dashboardVersion === null ? '/dashboard' : `/dashboard?since=${encodeURIComponent(dashboardVersion)}`;
+  fetch(url)
     .then(res => res.json())
-    .then(data => {
-      products = data;
-      renderStock();
-      renderSales();
-      renderSalesGraph();
+    .then(applyDashboard)
+    .catch(err => {
+      console.error("Dashboard fetch error:", err);
+      const statsEl = document.getElementById("stats");
+      statsEl.innerText = "⚠️ Failed to load stats";
+      delete statsEl.dataset.html;
     })
-    .catch(err => console.error("Stock fetch error:", err));
+    .finally(() => {
+      dashboardInFlight = false;
+      if (dashboardQueued) {
+        dashboardQueued = false;
+        fetchDashboard();
+      }
+    });
 }
 
-function fetchAnalytics() {
-  fetch('/analytics')
-    .then(res => res.json())
-    .then(data => {
-      pendingSupplier = data.pending_supplier || {};
-      supplierStockData = data.supplier || {};
-
-      const stats = `
-        <strong>Total Requests:</strong> ${data.total} |
-        <strong>Pending:</strong> ${data.pending} |
-        <strong>Approved:</strong> ${data.approved} |
-        <strong>Rejected:</strong> ${data.rejected}
-      `;
-      document.getElementById("stats").innerHTML = stats;
+function applyDashboard(data) {
+  if (data.since === null) {
+    products = data.stock;
+    requestsData = [];
+  } else {
+    Object.assign(products, data.stock);
+  }
+  for (const req of data.requests) {
+    // requestsData stays in id order: an older request coming back in a delta keeps its place
+    // instead of showing up as the newest
+    const i = requestSlot(req.id);
+    if (i < requestsData.length && requestsData[i].id === req.id) {
+      requestsData[i] = req;
+    } else {
+      requestsData.splice(i, 0, req);
+    }
+  }
+  dashboardVersion = data.version;
+  supplierStockData = data.analytics.supplier || {};
 
-      renderStock();
-      renderAlerts(data.alerts || {});
-    })
-    .catch(err => {
-      console.error("Analytics fetch error:", err);
-      document.getElementById("stats").innerText = "⚠️ Failed to load stats";
-    });
+  renderStats(data.analytics);
+  renderStock();
+  renderSales();
+  renderSalesGraph();
+  renderRequests(requestsData);
+  renderAlerts(data.alerts || {});
+}
+
+function requestSlot(id) {
+  // Index of the request with this id in requestsData, or where it belongs
+  let lo = 0;
+  let hi = requestsData.length;
+  while (lo < hi) {
+    const mid = (lo + hi) >> 1;
+    if (requestsData[mid].id < id) lo = mid + 1;
+    else hi = mid;
+  }
+  return lo;
+}
+
+function renderStats(data) {
+  const stats = `
+    <strong>Total Requests:</strong> ${data.total} |
+    <strong>Pending:</strong> ${data.pending} |
+    <strong>Approved:</strong> ${data.approved} |
+    <strong>Rejected:</strong> ${data.rejected} |
+    <strong>Failed:</strong> ${data.failed}
+  `;
+  const statsEl = document.getElementById("stats");
+  if (statsEl.dataset.html !== stats) {
+    statsEl.innerHTML = stats;
+    statsEl.dataset.html = stats;
+  }
+}
+
+// ===================== KEYED RENDER HELPERS =====================
+function setText(el, value) {
+  const text = String(value);
+  if (el.textContent !== text) el.textContent = text;
+}
+
+function keyedContainer(id) {
+  // Drop the "Loading..." placeholder the first time a keyed render touches the container
+  const container = document.getElementById(id);
+  if (!container.dataset.keyed) {
+    container.textContent = '';
+    container.dataset.keyed = '1';
+  }
+  return container;
+}
+
+function fieldsOf(el) {
+  const fields = {};
+  el.querySelectorAll('[data-field]').forEach(node => { fields[node.dataset.field] = node; });
+  return fields;
+}
+
+function pruneRows(rows, keep) {
+  for (const [key, row] of rows) {
+    if (!keep.has(key)) {
+      row.el.remove();
+      rows.delete(key);
+    }
+  }
+}
+
+// ===================== ALERTS =====================
+function createAlertRow(product) {
+  const el = document.createElement("div");
+  el.innerHTML = `
+    <strong data-field="title"></strong>
+    <ul data-field="list"></ul>
+    <button>📢 Report Environmental Issue</button>
+  `;
+  el.style.color = "red";
+  el.querySelector("button").addEventListener("click", () => reportIssue(product));
+  const fields = fieldsOf(el);
+  setText(fields.title, `${product} Alerts:`);
+  return { el, fields, key: null };
 }
 
 function renderAlerts(alerts) {
   const container = document.getElementById("alerts");
-  container.innerHTML = "";
+  const keep = new Set();
 
   for (const product in alerts) {
     const list = alerts[product];
-    if (list.length > 0) {
-      const div = document.createElement("div");
-      div.innerHTML = `
-        <strong>${product} Alerts:</strong>
-        <ul>${list.map(msg => `<li>${msg}</li>`).join('')}</ul>
-        <button onclick="reportIssue('${product}')">📢 Report Environmental Issue</button>
-      `;
-      div.style.color = "red";
-      container.appendChild(div);
+    if (list.length === 0) continue;
+    keep.add(product);
+
+    let row = alertRows.get(product);
+    if (!row) {
+      row = createAlertRow(product);
+      alertRows.set(product, row);
+      container.appendChild(row.el);
+    }
+    const key = list.join('\n');
+    if (row.key !== key) {
+      row.fields.list.replaceChildren(...list.map(msg => {
+        const li = document.createElement("li");
+        li.textContent = msg;
+        return li;
+      }));
+      row.key = key;
     }
   }
+  pruneRows(alertRows, keep);
 }
 
 function reportIssue(product) {
@@ -67,63 +185,111 @@ function reportIssue(product) {
     .then(res => res.json())
     .then(data => {
       alert(data.message);
-      fetchAnalytics(); // Refresh alerts after delay
+      fetchDashboard(); // Refresh alerts after delay
     })
     .catch(err => console.error("Failed to report issue:", err));
 }
 
+// ===================== STOCK & SALES =====================
+function createStockRow(product) {
+  const el = document.createElement('div');
+  el.innerHTML = `
+    <h3 data-field="name"></h3>
+    <div class="stock-cards">
+      <div class="stock-card"><strong>Shelf Stock:</strong><br> <span data-field="stock"></span></div>
+      <div class="stock-card"><strong>Supplier Inventory:</strong><br> <span data-field="supplier"></span></div>
+      <div class="stock-card"><strong>Pending Requests:</strong><br> <span data-field="pending"></span></div>
+      <div class="stock-card"><strong>Shelf Temp:</strong><br> <span data-field="shelfTemp"></span></div>
+      <div class="stock-card"><strong>Shelf Humidity:</strong><br> <span data-field="shelfHumidity"></span></div>
+      <div class="stock-card"><strong>Inventory Temp:</strong><br> <span data-field="inventoryTemp"></span></div>
+      <div class="stock-card"><strong>Inventory Humidity:</strong><br> <span data-field="inventoryHumidity"></span></div>
+    </div>
+    <button data-field="button"></button>
+  `;
+  const fields = fieldsOf(el);
+  setText(fields.name, product);
+  fields.button.id = `btn-${product}`;
+  fields.button.addEventListener('click', () => simulateSale(product));
+  return { el, fields };
+}
+
 function renderStock() {
-  const container = document.getElementById("stockContainer");
-  container.innerHTML = '';
+  const container = keyedContainer("stockContainer");
 
   for (const [product, info] of Object.entries(products)) {
+    let row = stockRows.get(product);
+    if (!row) {
+      row = createStockRow(product);
+      stockRows.set(product, row);
+      container.appendChild(row.el);
+    }
+
     const sensors = info.sensors || {};
     const shelf = sensors.shelf || {};
     const inventory = sensors.inventory || {};
-    const supplierAvailable = supplierStockData[product] ?? 0;
-    const pendingQty = pendingSupplier[product] || 0;
-
-    const div = document.createElement('div');
-    div.innerHTML = `
-      <h3>${product}</h3>
-      <div class="stock-cards">
-        <div class="stock-card"><strong>Shelf Stock:</strong><br> ${info.stock}</div>
-        <div class="stock-card"><strong>Supplier Inventory:</strong><br> ${supplierAvailable} units</div>
-        <div class="stock-card"><strong>Pending Requests:</strong><br> ${pendingQty} units</div>
-        <div class="stock-card"><strong>Shelf Temp:</strong><br> ${shelf.temp ?? 'N/A'} °C</div>
-        <div class="stock-card"><strong>Shelf Humidity:</strong><br> ${shelf.humidity ?? 'N/A'} %</div>
-        <div class="stock-card"><strong>Inventory Temp:</strong><br> ${inventory.temp ?? 'N/A'} °C</div>
-        <div class="stock-card"><strong>Inventory Humidity:</strong><br> ${inventory.humidity ?? 'N/A'} %</div>
-      </div>
-      <button id="btn-${product}" ${info.stock <= 0 ? 'disabled' : ''} onclick="simulateSale('${product}')">
-        ${info.stock <= 0 ? 'Out of Stock' : 'Simulate Sale (-1)'}
-      </button>
-    `;
-    container.appendChild(div);
+    const f = row.fields;
+    setText(f.stock, info.stock);
+    setText(f.supplier, `${supplierStockData[product] ?? 0} units`);
+    setText(f.pending, `${pendingSupplier[product] || 0} units`);
+    setText(f.shelfTemp, `${shelf.temp ?? 'N/A'} °C`);
+    setText(f.shelfHumidity, `${shelf.humidity ?? 'N/A'} %`);
+    setText(f.inventoryTemp, `${inventory.temp ?? 'N/A'} °C`);
+    setText(f.inventoryHumidity, `${inventory.humidity ?? 'N/A'} %`);
+
+    const outOfStock = info.stock <= 0;
+    if (f.button.disabled !== outOfStock) f.button.disabled = outOfStock;
+    setText(f.button, outOfStock ? 'Out of Stock' : 'Simulate Sale (-1)');
   }
+  pruneRows(stockRows, new Set(Object.keys(products)));
 }
 
 function renderSales() {
-  const container = document.getElementById("salesContainer");
-  container.innerHTML = '';
+  const container = keyedContainer("salesContainer");
 
   for (const [product, info] of Object.entries(products)) {
-    const div = document.createElement('div');
-    div.innerHTML = `
-      <h3>${product}</h3>
-      <p>Units Sold: <span id="sales-${product}">${info.sales}</span></p>
-    `;
-    container.appendChild(div);
+    let row = salesRows.get(product);
+    if (!row) {
+      const el = document.createElement('div');
+      el.innerHTML = `
+        <h3></h3>
+        <p>Units Sold: <span></span></p>
+      `;
+      el.querySelector('h3').textContent = product;
+      const sales = el.querySelector('span');
+      sales.id = `sales-${product}`;
+      row = { el, sales };
+      salesRows.set(product, row);
+      container.appendChild(el);
+    }
+    setText(row.sales, info.sales);
   }
+  pruneRows(salesRows, new Set(Object.keys(products)));
+}
+
+function sameArray(a, b) {
+  if (a.length !== b.length) return false;
+  for (let i = 0; i < a.length; i++) {
+    if (a[i] !== b[i]) return false;
+  }
+  return true;
 }
 
 function renderSalesGraph() {
-  const ctx = document.getElementById('salesChart').getContext('2d');
   const labels = Object.keys(products);
   const salesData = labels.map(p => products[p].sales);
 
-  if (salesChartInstance) salesChartInstance.destroy();
+  if (salesChartInstance) {
+    // Patch the existing chart's data in place instead of destroying and recreating it
+    const chart = salesChartInstance;
+    const dataset = chart.data.datasets[0];
+    if (sameArray(chart.data.labels, labels) && sameArray(dataset.data, salesData)) return;
+    chart.data.labels = labels;
+    dataset.data = salesData;
+    chart.update('none');
+    return;
+  }
 
+  const ctx = document.getElementById('salesChart').getContext('2d');
   salesChartInstance = new Chart(ctx, {
     type: 'bar',
     data: {
@@ -152,42 +318,97 @@ function simulateSale(product) {
     headers: { 'Content-Type': 'application/json' },
     body: JSON.stringify({ product, stock: newStock })
   })
-    .then(() => {
-      fetchStock();
-      fetchRequests();
-      fetchAnalytics();
-    })
+    .then(() => fetchDashboard())
     .catch(err => console.error("Sale simulation error:", err));
 }
 
-function fetchRequests() {
-  fetch('/requests')
-    .then(res => res.json())
-    .then(data => renderRequests(data))
-    .catch(err => console.error("Failed to load requests:", err));
+// ===================== REQUESTS (VIRTUALIZED) =====================
+function initRequestList() {
+  const list = document.getElementById("requestList");
+  const spacer = document.createElement("li");
+  spacer.className = "request-spacer";
+  spacer.setAttribute("aria-hidden", "true");
+  list.appendChild(spacer);
+  list.addEventListener("scroll", () => {
+    if (requestScrollPending) return;
+    requestScrollPending = true;
+    requestAnimationFrame(() => {
+      requestScrollPending = false;
+      renderVisibleRequests();
+    });
+  });
+  return spacer;
 }
 
+const requestSpacer = initRequestList();
+
 function renderRequests(requests) {
+  requestsData = requests;
+  requestSpacer.style.top = `${requests.length * REQUEST_ROW_HEIGHT}px`;
+  renderVisibleRequests();
+}
+
+function createRequestRow(id) {
+  const li = document.createElement("li");
+  li.style.height = `${REQUEST_ROW_HEIGHT - 10}px`;
+  li.innerHTML = `
+    <strong data-field="title"></strong><br>
+    Status: <em data-field="status"></em> at <span data-field="time"></span><br>
+    <span data-field="comment"><em>Comment:</em> <span data-field="commentText"></span><br></span>
+    <span data-field="actions">
+      <button data-field="approve">Approve</button>
+      <button data-field="reject">Reject</button>
+    </span>
+  `;
+  const fields = fieldsOf(li);
+  fields.approve.addEventListener("click", () => updateRequest(id, 'approve'));
+  fields.reject.addEventListener("click", () => updateRequest(id, 'reject'));
+  return { el: li, fields, key: null, top: null };
+}
+
+function patchRequestRow(row, req) {
+  const canApprove = req.status === "Pending" &&
+                     !(req.comment || "").includes("Skipped") &&
+                     supplierStockData[req.product] > 0;
+  const key = `${req.product}|${req.quantity}|${req.status}|${req.timestamp}|${req.comment}|${canApprove}`;
+  if (row.key === key) return;
+  row.key = key;
+
+  const f = row.fields;
+  setText(f.title, `Request #${req.id} – ${req.product} (${req.quantity})`);
+  setText(f.status, req.status);
+  setText(f.time, new Date(req.timestamp).toLocaleString());
+  setText(f.commentText, req.comment || "");
+  f.comment.style.display = req.comment ? "" : "none";
+  f.actions.style.display = canApprove ? "" : "none";
+}
+
+function renderVisibleRequests() {
   const list = document.getElementById("requestList");
-  list.innerHTML = "";
-
-  requests.slice().reverse().forEach(req => {
-    const canApprove = req.status === "Pending" &&
-                       !(req.comment || "").includes("Skipped") &&
-                       supplierStockData[req.product] > 0;
-
-    const li = document.createElement("li");
-    li.innerHTML = `
-      <strong>Request #${req.id}</strong> – ${req.product} (${req.quantity})<br>
-      Status: <em>${req.status}</em> at ${new Date(req.timestamp).toLocaleString()}<br>
-      ${req.comment ? `<em>Comment:</em> ${req.comment}<br>` : ""}
-      ${canApprove ? `
-        <button onclick="updateRequest(${req.id}, 'approve')">Approve</button>
-        <button onclick="updateRequest(${req.id}, 'reject')">Reject</button>
-      ` : ""}
-    `;
-    list.appendChild(li);
-  });
+  const total = requestsData.length;
+  const first = Math.max(0, Math.floor(list.scrollTop / REQUEST_ROW_HEIGHT) - REQUEST_OVERSCAN);
+  const last = Math.min(total, Math.ceil((list.scrollTop + list.clientHeight) / REQUEST_ROW_HEIGHT) + REQUEST_OVERSCAN);
+  const keep = new Set();
+
+  // Newest first (LIFO): display slot i shows requestsData[total - 1 - i]
+  for (let i = first; i < last; i++) {
+    const req = requestsData[total - 1 - i];
+    keep.add(req.id);
+
+    let row = requestRows.get(req.id);
+    if (!row) {
+      row = createRequestRow(req.id);
+      requestRows.set(req.id, row);
+      list.appendChild(row.el);
+    }
+    const top = i * REQUEST_ROW_HEIGHT;
+    if (row.top !== top) {
+      row.el.style.top = `${top}px`;
+      row.top = top;
+    }
+    patchRequestRow(row, req);
+  }
+  pruneRows(requestRows, keep);
 }
 
 function updateRequest(id, action) {
@@ -198,14 +419,9 @@ function updateRequest(id, action) {
     headers: { 'Content-Type': 'application/json' },
     body: JSON.stringify({ id, action, comment })
   })
-    .then(() => {
-      fetchRequests();
-      fetchAnalytics();
-      fetchStock();
-    });
+    .then(() => fetchDashboard());
 }
 
 // INIT
-fetchStock();
-fetchRequests();
-fetchAnalytics();
+fetchDashboard();
+setInterval(fetchDashboard, DASHBOARD_POLL_MS);
@@ -1,10 +1,35 @@
 from flask import Flask, request, jsonify, render_template_string, redirect
-from datetime import datetime
+import functools
+import math
+import os
 import threading
 import time
 import uuid
+from werkzeug.serving import is_running_from_reloader
+
+from catalog_io import parse_inventory, read_rows, stream_format, text_stream
+from export import in_range, ndjson_response, time_range
+from fulfilment import FEED_SIZE, STAGE_SECONDS, FulfilmentEngine
+from jsonprovider import FragmentCache, init_json
+from ratelimit import RateLimiter
+from records import SupplierOrder
 
 app = Flask(__name__)
+init_json(app)
+# Defaults come from the environment; create_app(config) overrides them before the engine is built
+app.config.from_mapping(
+    FULFILMENT_STAGE_SECONDS=float(os.environ.get('FULFILMENT_STAGE_SECONDS', STAGE_SECONDS)),
+    # CSV or JSON Lines of name,quantity loaded by create_app() on top of the inventory below
+    INVENTORY_PATH=os.environ.get('INVENTORY_PATH'),
+    # Per-store token buckets on /new-request and GET /inventory; a rate of 0 turns them off
+    STORE_RATE_PER_SECOND=float(os.environ.get('STORE_RATE_PER_SECOND', 20)),
+    STORE_RATE_BURST=int(os.environ.get('STORE_RATE_BURST', 40)),
+    # Orders a store may have open (not dispatched, failed or rejected) before new ones are refused
+    MAX_OPEN_ORDERS_PER_STORE=int(os.environ.get('MAX_OPEN_ORDERS_PER_STORE', 200)),
+    # Stores one client address may speak for: its calls and open orders are capped at this many
+    # stores' worth, so a client sending a new X-Store-Id on each call cannot get past the limits
+    STORES_PER_ADDRESS=int(os.environ.get('STORES_PER_ADDRESS', 4)),
+)
 
 # Simulated inventory
 supplier_inventory = {
@@ -15,9 +40,60 @@ supplier_inventory = {
 
 # Store incoming requests from retail stores
 supplier_requests = []
+# Orders from the same store share one contact dict
+store_profiles = {}
+# Built by create_app()
+fulfilment = None
+rate_limiter = None
+address_limiter = None
+# Feed events are immutable, so each one is encoded once however many times it is polled
+event_fragments = FragmentCache(app.json, key=lambda e: e['seq'], is_final=lambda e: True, max_items=FEED_SIZE)
+# ===================== ADMISSION CONTROL =====================
+def store_key():
+    # Stores identify themselves with X-Store-Id, told apart per client address. Order bodies are
+    # never used: their free-form store names would put one store's calls in many buckets. The
+    # header is the client's choice, so the address is limited as well (address_limiter,
+    # max_open_per_address)
+    return request.remote_addr, request.headers.get('X-Store-Id')
+
+def too_many_requests(error, retry_after):
+    # retry_after None: no time can be promised, so no Retry-After header
+    response = jsonify({'error': error, 'retry_after': None if retry_after is None else round(retry_after, 3)})
+    response.status_code = 429
+    if retry_after is not None:
+        response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
+
+def rate_limited(view):
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if rate_limiter is not None:
+            # The address first: a refused call then takes no token from the store's bucket
+            wait = address_limiter.acquire(request.remote_addr) or rate_limiter.acquire(store_key())
+            if wait:
+                return too_many_requests('Rate limit exceeded', wait)
+        return view(*args, **kwargs)
+    return wrapper
+
 @app.route('/inventory', methods=['GET'])
+@rate_limited
 def get_inventory():
     return jsonify(supplier_inventory)
+
+@app.route('/inventory/import', methods=['POST'])
+def import_inventory():
+    # Streamed CSV or JSON Lines of name,quantity (catalog_io.py); all or nothing
+    try:
+        fmt = stream_format(request.args.get('format'), request.mimetype)
+    except ValueError:
+        return jsonify({'error': 'Invalid format'}), 400
+    items, errors, error_count = read_rows(text_stream(request.stream), fmt, parse_inventory, app.json.loads)
+    if error_count:
+        return jsonify({'error': 'Invalid rows', 'invalid': error_count, 'errors': errors}), 400
+    # The fulfilment engine draws stock down under its lock
+    with fulfilment.cond:
+        supplier_inventory.update(items)
+    return jsonify({'imported': len(items), 'products': len(supplier_inventory)})
 @app.route('/')
 
 def home():
@@ -101,6 +177,7 @@ def home():
     return render_template_string(html_template, inventory=supplier_inventory, requests=supplier_requests)
 
 @app.route('/new-request', methods=['POST'])
+@rate_limited
 def new_request():
     data = request.get_json()
     product = data.get('product')
@@ -111,18 +188,16 @@ def new_request():
         return jsonify({'error': 'Invalid product or quantity'}), 400
 
     req_id = str(uuid.uuid4())[:8]
-    supplier_requests.append({
-        'id': req_id,
-        'product': product,
-        'quantity': quantity,
-        'store': {
-            'name': store_info.get('name'),
-            'phone': store_info.get('phone'),
-            'address': store_info.get('address')
-        },
-        'status': 'Pending',
-        'dispatched_at': None
-    })
+    contact = (store_info.get('name'), store_info.get('phone'), store_info.get('address'))
+    store = store_profiles.get(contact)
+    if store is None:
+        store = store_profiles[contact] = dict(zip(('name', 'phone', 'address'), contact))
+    req = SupplierOrder(req_id, product, quantity, store, time.time(), client=store_key(),
+                        address=request.remote_addr)
+    if not fulfilment.submit(req):
+        # Approved orders finish on the stage timer; pending ones only when someone decides them
+        return too_many_requests('Too many open orders for this store', fulfilment.retry_after(req))
+    supplier_requests.append(req)
 
     return jsonify({'message': 'Request received', 'id': req_id}), 200
 
@@ -131,43 +206,72 @@ def update_request_status():
     req_id = request.form.get('id')
     action = request.form.get('action')
 
-    for req in supplier_requests:
-        if req['id'] == req_id and req['status'] == 'Pending':
-            req['status'] = 'Approved' if action == 'approve' else 'Rejected'
-            break
+    fulfilment.decide(req_id, action)
     return redirect('/')
 
-def process_requests():
-    while True:
-        for req in supplier_requests:
-            if req['status'] == 'Approved':
-
-                print(f"[START] Processing request {req['id']}")
-                time.sleep(2.5)
-                req['status'] = 'processing started'
-                # Simulate picking
-                print(f"[Picking] {req['quantity']} x {req['product']}")
-                time.sleep(2.5)
-                req['status'] = 'picking items'
-                # Simulate packing
-                print(f"[Packing] {req['quantity']} x {req['product']}")
-                time.sleep(2.5)
-                req['status'] = 'packing items'
-
-                time.sleep(2.5)
-                # Dispatch
-                if supplier_inventory[req['product']] >= req['quantity']:
-                    supplier_inventory[req['product']] -= req['quantity']
-                    req['status'] = 'Dispatched'
-                    req['dispatched_at'] = datetime.now().isoformat()
-                    print(f"[Dispatched] {req['product']} to {req['store']['name']}")
-                else:
-                    req['status'] = 'Failed - Out of stock'
-                    print(f"[FAILED] Not enough stock for {req['id']}")
-        time.sleep(5)
-
-# Start background thread
-threading.Thread(target=process_requests, daemon=True).start()
+@app.route('/request-events', methods=['GET'])
+def request_events():
+    try:
+        since = int(request.args.get('since', 0))
+    except ValueError:
+        return jsonify({'error': 'Invalid since'}), 400
+    feed = fulfilment.changes(since)
+    feed['changes'] = event_fragments.array(feed['changes'])
+    return jsonify(feed)
+
+@app.route('/export/requests.ndjson', methods=['GET'])
+def export_requests():
+    try:
+        start, end = time_range(request.args)
+    except ValueError:
+        return jsonify({'error': 'Invalid from/to'}), 400
+    return ndjson_response(app, in_range(supplier_requests, start, end, lambda r: r.created_at))
+
+# App factory and background thread: same contract as app.create_app and app.start_background
+factory_lock = threading.Lock()
+
+def create_app(config=None):
+    global fulfilment, rate_limiter, address_limiter
+    with factory_lock:
+        if fulfilment is not None:
+            if config:
+                raise RuntimeError('create_app() already built the app; pass config to the first call')
+            return app
+        app.config.update(config or {})
+        if app.config['INVENTORY_PATH']:
+            path = app.config['INVENTORY_PATH']
+            with open(path, encoding='utf-8', newline='') as f:
+                items, errors, error_count = read_rows(f, 'csv' if path.endswith('.csv') else 'jsonl',
+                                                       parse_inventory, app.json.loads)
+            if error_count:
+                raise ValueError(f'{path}: {error_count} invalid rows, first: {errors[0]}')
+            supplier_inventory.update(items)
+        stores = app.config['STORES_PER_ADDRESS']
+        if app.config['STORE_RATE_PER_SECOND'] > 0:
+            rate_limiter = RateLimiter(app.config['STORE_RATE_PER_SECOND'], app.config['STORE_RATE_BURST'])
+            address_limiter = RateLimiter(app.config['STORE_RATE_PER_SECOND'] * stores,
+                                          app.config['STORE_RATE_BURST'] * stores)
+        max_open = app.config['MAX_OPEN_ORDERS_PER_STORE'] or None
+        fulfilment = FulfilmentEngine(supplier_inventory, app.config['FULFILMENT_STAGE_SECONDS'],
+                                      max_open_per_store=max_open,
+                                      max_open_per_address=max_open and max_open * stores)
+    return app
+
+background_lock = threading.Lock()
+background_started = False
+
+def start_background():
+    global background_started
+    create_app()
+    with background_lock:
+        if background_started:
+            return False
+        threading.Thread(target=fulfilment.run, daemon=True).start()
+        background_started = True
+    return True
 
 if __name__ == '__main__':
+    create_app()
+    if is_running_from_reloader():
+        start_background()
     app.run(port=5001, debug=True)
@@ -0,0 +1,39 @@
+# Concurrent POST /stock and POST /requests must lose no updates, with per-product locks and with
+# the global lock. Same rounds as benchmarks/concurrency.py, scaled down.
+# Run from the repo root: python -m pytest tests
+
+import os
+import sys
+from unittest import mock
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as store
+from benchmarks.concurrency import SupplierStub, add_products, decisions, stock_rounds
+
+THREADS = 16
+
+
+@pytest.fixture
+def supplier(monkeypatch):
+    store.create_app()
+    stub = SupplierStub()
+    monkeypatch.setattr(store, 'get_supplides', stub.available)
+    with mock.patch('requests.post', stub.post):
+        yield stub
+
+
+@pytest.mark.parametrize('global_lock', [False, True])
+def test_no_lost_sales(supplier, monkeypatch, global_lock):
+    monkeypatch.setattr(store.state, 'global_lock', global_lock)
+    _, lost = stock_rounds(add_products(4), THREADS, 10)
+    assert lost == 0
+
+
+@pytest.mark.parametrize('global_lock', [False, True])
+def test_each_request_sent_once(supplier, monkeypatch, global_lock):
+    monkeypatch.setattr(store.state, 'global_lock', global_lock)
+    _, lost = decisions(add_products(4), THREADS, 50, supplier)
+    assert lost == 0
@@ -0,0 +1,158 @@
+# Tiered time-series store for sensor history
+# Raw readings for the last hour, 1-minute rollups for a day, 15-minute rollups for a month.
+# Only the raw hour is held in memory: simulator ticks as one (products x locations) block per tick,
+# readings ingested from gateways as fixed-width numpy columns per product/location. The rollup
+# tiers are the on-disk archive's (archive.py), maintained as each block is written, so memory stays
+# at one hour of rows however much history there is.
+
+import math
+import threading
+from collections import deque
+
+import numpy as np
+
+# (step seconds, retention seconds); step 0 is the raw tier
+DEFAULT_TIERS = ((0, 3600), (60, 86400), (900, 30 * 86400))
+MAX_POINTS = 500
+# Raw rows per series: capacity grows by half from INITIAL_ROWS while the oldest row is still
+# within the retention, and once at MAX_RAW_ROWS the oldest row is overwritten
+INITIAL_ROWS = 64
+MAX_RAW_ROWS = 4096
+
+
+class RawSeries:
+    # Ring buffer of (ts, temp, humidity) rows in arrival order; rows older than the retention are
+    # overwritten before the buffer grows
+    __slots__ = ('retention', 'ts', 'temp', 'humidity', 'size', 'next', 'latest')
+
+    def __init__(self, retention):
+        self.retention = retention
+        self.ts = np.empty(INITIAL_ROWS, np.float64)
+        self.temp = np.empty(INITIAL_ROWS, np.float32)
+        self.humidity = np.empty(INITIAL_ROWS, np.float32)
+        self.size = 0
+        self.next = 0
+        self.latest = float('-inf')
+
+    def add(self, ts, temp, humidity):
+        if ts > self.latest:
+            self.latest = ts
+        capacity = len(self.ts)
+        if self.size == capacity:
+            if self.ts[self.next] >= self.latest - self.retention and capacity < MAX_RAW_ROWS:
+                self._grow(capacity)
+        else:
+            self.size += 1
+        i = self.next
+        self.ts[i] = ts
+        self.temp[i] = temp
+        self.humidity[i] = humidity
+        self.next = (i + 1) % len(self.ts)
+
+    def _grow(self, capacity):
+        # Unroll the full ring oldest-first into a larger one
+        order = np.r_[self.next:capacity, 0:self.next]
+        grown = min(MAX_RAW_ROWS, capacity + capacity // 2)
+        for name in ('ts', 'temp', 'humidity'):
+            old = getattr(self, name)
+            new = np.empty(grown, old.dtype)
+            new[:capacity] = old[order]
+            setattr(self, name, new)
+        self.next = capacity
+        self.size = capacity + 1
+
+    def query(self, start, end):
+        ts = self.ts[:self.size]
+        keep = np.flatnonzero((ts >= max(start, self.latest - self.retention)) & (ts <= end))
+        keep = keep[np.argsort(ts[keep], kind='stable')]
+        return [{'ts': t, 'temp': round(c, 2), 'humidity': round(h, 2)}
+                for t, c, h in zip(ts[keep].tolist(), self.temp[keep].tolist(), self.humidity[keep].tolist())]
+
+
+def pick_tier(tiers, latest, start, end, resolution=None):
+    # Cheapest tier = coarsest one that still covers `start` and is at least as fine as requested
+    if resolution is None:
+        resolution = max(0, (end - start) / MAX_POINTS)
+    covering = [i for i, (_, retention) in enumerate(tiers) if start >= latest - retention]
+    if not covering:
+        return len(tiers) - 1
+    fine_enough = [i for i in covering if tiers[i][0] <= resolution]
+    return max(fine_enough) if fine_enough else min(covering)
+
+
+class SensorStore:
+    def __init__(self, archive, tiers=DEFAULT_TIERS):
+        self.archive = archive
+        self.tiers = tiers
+        # Ingested readings, per product/location
+        self.series = {}
+        # Simulator ticks of the raw hour as (ts, index, locations, temps, humidity), oldest first
+        self.ticks = deque()
+        self.lock = threading.Lock()
+
+    def add_tick(self, ts, index, locations, temps, humidity):
+        # One simulator tick: (products x locations) arrays, `index` mapping a product to its row
+        block = (ts, index, {loc: j for j, loc in enumerate(locations)},
+                 temps.astype(np.float32), humidity.astype(np.int16))
+        with self.lock:
+            self.ticks.append(block)
+            while self.ticks[0][0] < ts - self.tiers[0][1]:
+                self.ticks.popleft()
+
+    def recent_ticks(self, product, count):
+        # The product's readings in the newest `count` ticks as [(ts, {location: reading})]
+        with self.lock:
+            ticks = list(self.ticks)
+        recent = []
+        for ts, index, locations, temps, humidity in reversed(ticks):
+            i = index.get(product)
+            if i is None:
+                continue
+            recent.append((ts, {loc: {'temp': round(float(temps[i, j]), 2), 'humidity': int(humidity[i, j])}
+                                for loc, j in locations.items()}))
+            if len(recent) == count:
+                break
+        return recent[::-1]
+
+    def _tick_rows(self, product, start, end):
+        # {location: [(ts, temp, humidity)]} from the ticks in [start, end]
+        with self.lock:
+            ticks = list(self.ticks)
+        rows = {}
+        for ts, index, locations, temps, humidity in ticks:
+            i = index.get(product)
+            if i is None or not start <= ts <= end:
+                continue
+            for loc, j in locations.items():
+                rows.setdefault(loc, []).append((ts, temps[i, j], humidity[i, j]))
+        return rows
+
+    def add(self, product, location, ts, temp, humidity):
+        by_location = self.series.setdefault(product, {})
+        series = by_location.get(location)
+        if series is None:
+            series = by_location[location] = RawSeries(self.tiers[0][1])
+        series.add(ts, temp, humidity)
+
+    def query(self, product, start, end, resolution=None):
+        # Returns (step, {location: points}); all locations of a product come from the same tier
+        by_location = self.series.get(product, {})
+        latest = max((s.latest for s in by_location.values()), default=float('-inf'))
+        with self.lock:
+            if self.ticks and product in self.ticks[-1][1]:
+                latest = max(latest, self.ticks[-1][0])
+        latest = end if latest == float('-inf') else latest
+        tier = pick_tier(self.tiers, latest, start, end, resolution)
+        step = self.tiers[tier][0]
+        if step == 0:
+            points = {loc: series.query(start, end) for loc, series in by_location.items()}
+            for loc, rows in self._tick_rows(product, max(start, latest - self.tiers[0][1]), end).items():
+                ticked = [{'ts': ts, 'temp': round(float(temp), 2), 'humidity': int(humidity)}
+                          for ts, temp, humidity in rows]
+                points[loc] = sorted(points.get(loc, []) + ticked, key=lambda point: point['ts'])
+            return step, points
+        if start < latest - self.tiers[-1][1]:
+            # Older than every tier: buckets coarse enough to keep the answer to MAX_POINTS, in whole
+            # multiples of the coarsest tier's so they are summed from its buckets
+            step = step * math.ceil(max(resolution or 0, step, (end - start) / MAX_POINTS) / step)
+        return step, self.archive.rollup(product, start, end, step)